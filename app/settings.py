@@ -156,6 +156,17 @@ STORAGES = {
     "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
 }
 
+# ------------------------------------------------------------
+# LaTeX render cache (compiled PDFs/SVGs keyed by TeX source hash)
+# ------------------------------------------------------------
+LATEX_CACHE_DIR = Path(os.getenv("LATEX_CACHE_DIR", BASE_DIR / "latex_cache"))
+# Bounds enforced by `manage.py prune_latex_cache` (run it from cron)
+LATEX_CACHE_MAX_AGE_DAYS = int(os.getenv("LATEX_CACHE_MAX_AGE_DAYS", "30"))
+LATEX_CACHE_MAX_MB = int(os.getenv("LATEX_CACHE_MAX_MB", "512"))
+# When fronted by nginx: internal location that aliases static/texcache, e.g. "/_texcache/".
+# Empty means Django streams the file itself.
+TEXCACHE_ACCEL_PREFIX = os.getenv("TEXCACHE_ACCEL_PREFIX", "")
+
 
 # ------------------------------------------------------------
 # Auth redirects
@@ -1,5 +1,9 @@
 # practice/admin.py
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import (
     Tag,
     StudentProfile,
@@ -11,6 +15,43 @@ from .models import (
     AttemptView,
 )
 
+# --- Changelist projection -------------------------------------------------
+class ProjectedChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        qs = super().get_queryset(request, exclude_parameters)
+        return qs.defer(*self.model_admin.changelist_defer)
+
+class ProjectedAdmin(admin.ModelAdmin):
+    """ModelAdmin whose list page skips the columns named in `changelist_defer`.
+    Change forms still load full rows."""
+    changelist_defer = ()
+
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
+
+# --- Pagination for the append-only tables ----------------------------------
+class EstimatedCountPaginator(Paginator):
+    """On PostgreSQL, count an unfiltered changelist from pg_class.reltuples
+    instead of COUNT(*). Filtered/searched lists and other backends count exactly."""
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        conn = connections[qs.db]
+        if conn.vendor == "postgresql" and not qs.query.where:
+            with conn.cursor() as c:
+                c.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [qs.model._meta.db_table],
+                )
+                row = c.fetchone()
+            if row and row[0] > 0:  # -1/0 until the table has been analyzed
+                return row[0]
+        return super().count
+
+# Big TeX/JSON payloads on Question that no changelist column renders
+QUESTION_HEAVY = ("stem_md", "choices", "correct", "diagnostic_keys")
+
 # --- Tags --------------------------------------------------------------------
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -21,32 +62,49 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(StudentProfile)
 class StudentProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "sid", "grade")
+    list_select_related = ("user",)
     search_fields = ("sid", "user__username", "user__email")
+    raw_id_fields = ("user",)
     filter_horizontal = ("subjects",)
 
 @admin.register(Classroom)
 class ClassroomAdmin(admin.ModelAdmin):
     list_display = ("name", "owner")
+    list_select_related = ("owner",)
     search_fields = ("name", "owner__username")
+    autocomplete_fields = ("owner",)
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ("classroom", "student")
+    list_select_related = ("classroom", "student")
     search_fields = ("classroom__name", "student__username")
+    autocomplete_fields = ("classroom", "student")
 
 # --- Questions ---------------------------------------------------------------
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(ProjectedAdmin):
     list_display  = ("id", "type", "version", "created_by", "created_at")
+    list_select_related = ("created_by",)
+    changelist_defer = QUESTION_HEAVY
     list_filter   = ("type", "tags")
-    search_fields = ("stem_md",)
+    search_fields = ("stem_md",)  # icontains; served by the q_stem_trgm index on PostgreSQL
+    autocomplete_fields = ("created_by", "tags")
 
 # --- AttemptItem -------------------------------------------------------------
 @admin.register(AttemptItem)
-class AttemptItemAdmin(admin.ModelAdmin):
+class AttemptItemAdmin(ProjectedAdmin):
     list_display = ("id", "attempt", "student", "question", "is_correct", "created_at")
+    list_select_related = ("attempt", "student", "question")
+    changelist_defer = (
+        "submitted", "tags_snapshot", "diag_snapshot",
+        *(f"question__{f}" for f in QUESTION_HEAVY),
+    )
     list_filter  = ("is_correct",)
     search_fields = ("attempt__id", "question__id", "attempt__student__username")
+    raw_id_fields = ("attempt", "student", "question")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # --- AttemptView (inline + standalone) --------------------------------------
 class AttemptViewInline(admin.TabularInline):
@@ -58,8 +116,10 @@ class AttemptViewInline(admin.TabularInline):
     ordering = ("-created_at",)
 
 @admin.register(AttemptView)
-class AttemptViewAdmin(admin.ModelAdmin):
+class AttemptViewAdmin(ProjectedAdmin):
     list_display  = ("id", "attempt", "question", "view_ms", "created_at")
+    list_select_related = ("attempt", "question")
+    changelist_defer = tuple(f"question__{f}" for f in QUESTION_HEAVY)
     ordering      = ("-created_at",)
     list_filter   = ("created_at",)
     search_fields = (
@@ -68,13 +128,20 @@ class AttemptViewAdmin(admin.ModelAdmin):
         "attempt__student__username",
         "attempt__student__email",
     )
+    raw_id_fields = ("attempt", "question")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # --- Attempt (single registration; includes inline) --------------------------
 @admin.register(Attempt)
 class AttemptAdmin(admin.ModelAdmin):
     list_display  = ("id", "student", "assignment_title", "started_at", "completed_at")
+    list_select_related = ("student",)
     search_fields = ("student__username", "assignment_title")
     list_filter   = ("started_at", "completed_at")
+    raw_id_fields = ("student",)
     inlines       = [AttemptViewInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
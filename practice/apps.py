@@ -1,8 +1,38 @@
+import logging
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
 
+log = logging.getLogger(__name__)
+
+
+def _warm_latex():
+    # First Tectonic run in a fresh container fetches the bundle and builds font caches;
+    # do it here rather than inside the first request that needs LaTeX. cache=False:
+    # a PDF cached by an earlier boot would skip Tectonic and warm nothing.
+    from .utils.latex_assets import compile_tex
+    try:
+        compile_tex(r"\documentclass{standalone}\begin{document}x\end{document}", cache=False)
+    except Exception:
+        log.exception("LaTeX warm-up failed; the first LaTeX request will pay the cold start")
+
+
+def _is_web_process() -> bool:
+    # gunicorn workers, or the runserver child (not the autoreloader parent); management
+    # commands like migrate/import_tex don't need a warm LaTeX toolchain
+    if os.path.basename(sys.argv[0]).startswith("gunicorn"):
+        return True
+    return "runserver" in sys.argv and os.environ.get("RUN_MAIN") == "true"
+
+
 class PracticeConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "practice"
 
     def ready(self):
         from . import signals  # noqa: F401
+
+        if os.environ.get("LATEX_WARMUP", "1") != "0" and _is_web_process():
+            threading.Thread(target=_warm_latex, name="latex-warmup", daemon=True).start()
@@ -37,7 +37,8 @@ class StudentSignupForm(UserCreationForm):
             user.save()
             dob = self.cleaned_data.get("date_of_birth")
             if dob:
-                # profile is created by your post_save signal
+                # profile is created by the post_save signal, which leaves it cached
+                # on user.studentprofile: no fetch, and the cached copy stays current
                 user.studentprofile.date_of_birth = dob
                 user.studentprofile.save(update_fields=["date_of_birth"])
         return user
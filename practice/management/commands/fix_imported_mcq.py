@@ -1,15 +1,13 @@
 # practice/management/commands/fix_imported_mcq.py
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from practice.models import Question
 
 class Command(BaseCommand):
     help = "Set type='mcq' for any question that has choices but was imported with a non-mcq type."
 
     def handle(self, *args, **kwargs):
-        qs = Question.objects.exclude(choices=None).exclude(choices={}).exclude(type="mcq")
-        n = 0
-        for q in qs:
-            q.type = "mcq"
-            q.save(update_fields=["type"])
-            n += 1
+        # One UPDATE statement; no per-row save() round-trips. The type predicate
+        # matches the q_type_nonmcq partial index.
+        n = Question.objects.filter(~Q(choices=None), ~Q(choices={}), ~Q(type="mcq")).update(type="mcq")
         self.stdout.write(self.style.SUCCESS(f"Updated {n} question(s) to type='mcq'."))
@@ -1,12 +1,20 @@
 # practice/management/commands/import_mc_enumerate.py
 import re
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from practice.models import Question, Tag
+from django.db import transaction
+from practice.models import Question
+from practice.utils.bulk_import import (
+    resolve_tag_ids, create_questions, add_question_tags, parse_files,
+    changed_files, record_imported,
+)
+from practice.utils.regex import compile_linear
 
 # Tokens we’ll scan for (handles nested enumerates)
-TOKEN_RE = re.compile(
+TOKEN_RE = compile_linear(
     r"(\\begin\{enumerate\}(\[(?P<opt>.*?)\]))"   # begin enumerate [options]
     r"|"
     r"(\\end\{enumerate\})"                       # end enumerate
@@ -15,26 +23,94 @@ TOKEN_RE = re.compile(
     flags=re.M
 )
 
-ALPH_ENUM_RE = re.compile(
+ALPH_ENUM_RE = compile_linear(
     r"\\begin\{enumerate\}\s*\[label=\(\\Alph\*\)\](?P<body>[\s\S]*?)\\end\{enumerate\}",
     flags=re.S
 )
 
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ITEM_SPLIT_RE = re.compile(r"\\item\s+")
+FILENAME_SPLIT_RE = re.compile(r"[^\w]+")
+
 def split_choices_from_body(body: str):
     """
     Choices inside the inner enumerate are often written on one line:
       \\item $-2$ \\item $-1/2$ ...
     So don't anchor at line start—split on any '\\item '.
     """
-    parts = re.split(r"\\item\s+", body)
-    parts = [p.strip() for p in parts if p.strip()]
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    return {letters[i]: parts[i] for i in range(min(len(parts), len(letters)))}
+    parts = (p.strip() for p in ITEM_SPLIT_RE.split(body))
+    return dict(zip(LETTERS, (p for p in parts if p)))
+
+def stem_key(stem_md: str) -> bytes:
+    # 20-byte digest instead of the full stem keeps the dedup set small
+    return hashlib.sha1(stem_md.encode("utf-8")).digest()
 
-def infer_tags_from_filename(stem: str):
-    # e.g., "Ch4_problems" -> ["Ch4", "problems"]
-    bits = [b for b in re.split(r"[^\w]+", stem) if b]
-    return bits
+@lru_cache(maxsize=1024)
+def infer_tags_from_filename(stem: str) -> tuple:
+    # e.g., "Ch4-problems" -> ("Ch4", "problems")
+    return tuple(b for b in FILENAME_SPLIT_RE.split(stem) if b)
+
+def parse_problems(path: Path):
+    """
+    Parse one .tex file into [(qtype, stem_md, choices), ...], one per A1/A2/… problem.
+    Pure (no DB access) so import runs can fan it out across processes.
+    """
+    tex = path.read_text(encoding="utf-8", errors="ignore")
+
+    # Walk the document token-by-token, tracking enumerate nesting.
+    stack = []               # each entry: {"label": "...raw options..."}
+    current_item_start = None
+    current_item_label  = None
+
+    def active_label():
+        return stack[-1]["label"] if stack else None
+
+    # Collect all top-level problem items (those whose active label contains A\arabic*)
+    problem_items = []
+
+    for m in TOKEN_RE.finditer(tex):
+        tok = m.group(0)
+        if tok.startswith("\\begin{enumerate"):
+            stack.append({"label": m.group("opt") or ""})
+        elif tok.startswith("\\end{enumerate}"):
+            # close current open problem item if we’re closing its level
+            if current_item_start is not None and current_item_label == active_label():
+                problem_items.append(tex[current_item_start:m.start()])
+                current_item_start = None
+                current_item_label = None
+            if stack:
+                stack.pop()
+        else:
+            # \item
+            lbl = active_label() or ""
+            if "A\\arabic*" in lbl or "\\textbf{A\\arabic*" in lbl:
+                # We’re at a top-level problem item (A1/A2/…)
+                if current_item_start is not None:
+                    problem_items.append(tex[current_item_start:m.start()])
+                current_item_start = m.end()
+                current_item_label  = lbl
+            else:
+                # ignore inner \item (choices)
+                pass
+
+    # finalize last item (if file ended without closing)
+    if current_item_start is not None:
+        problem_items.append(tex[current_item_start:])
+
+    # For each problem item, split stem and choices from inner enumerate
+    problems = []
+    for item_text in problem_items:
+        mm = ALPH_ENUM_RE.search(item_text)
+        if mm:
+            stem_md = item_text[:mm.start()].strip()
+            choices = split_choices_from_body(mm.group("body"))
+            qtype = "mcq"
+        else:
+            stem_md = item_text.strip()
+            choices = {}
+            qtype = "open"
+        problems.append((qtype, stem_md, choices))
+    return problems
 
 class Command(BaseCommand):
     help = "Import multiple-choice problems from LaTeX with outer A1/A2 enumerate and inner (A)(B)(C)(D)."
@@ -43,6 +119,7 @@ class Command(BaseCommand):
         parser.add_argument("path", type=str, help="Path to .tex file or directory")
         parser.add_argument("--tag", action="append", default=[], help="Extra tag(s) to attach")
         parser.add_argument("--dry-run", action="store_true", help="Parse and print summary without writing to DB")
+        parser.add_argument("--force", action="store_true", help="Re-parse files even if unchanged since the last import")
 
     def handle(self, *args, **opts):
         root = Path(opts["path"]).resolve()
@@ -59,68 +136,32 @@ class Command(BaseCommand):
         if not created_by:
             raise CommandError("No users exist. Create one admin/user first.")
 
+        # Skip files whose bytes match what the last import recorded
+        changed, stamps = changed_files("import_mc_enumerate", files)
+        if not opts["force"]:
+            if len(changed) < len(files):
+                self.stdout.write(f"Skipping {len(files) - len(changed)} unchanged file(s).")
+            files = changed
+
         total_created = 0
         total_detected = 0
+        pending = []   # (qtype, stem_md, choices, tag_names) rows to insert in one go
 
-        for f in files:
-            tex = f.read_text(encoding="utf-8", errors="ignore")
-            extra_tags = infer_tags_from_filename(f.stem) + opts["tag"]
-
-            # Walk the document token-by-token, tracking enumerate nesting.
-            stack = []               # each entry: {"label": "...raw options..."}
-            current_item_start = None
-            current_item_label  = None
-
-            def active_label():
-                return stack[-1]["label"] if stack else None
-
-            # Collect all top-level problem items (those whose active label contains A\arabic*)
-            problem_items = []
-
-            for m in TOKEN_RE.finditer(tex):
-                tok = m.group(0)
-                if tok.startswith("\\begin{enumerate"):
-                    stack.append({"label": m.group("opt") or ""})
-                elif tok.startswith("\\end{enumerate}"):
-                    # close current open problem item if we’re closing its level
-                    if current_item_start is not None and current_item_label == active_label():
-                        problem_items.append(tex[current_item_start:m.start()])
-                        current_item_start = None
-                        current_item_label = None
-                    if stack:
-                        stack.pop()
-                else:
-                    # \item
-                    lbl = active_label() or ""
-                    if "A\\arabic*" in lbl or "\\textbf{A\\arabic*" in lbl:
-                        # We’re at a top-level problem item (A1/A2/…)
-                        if current_item_start is not None:
-                            problem_items.append(tex[current_item_start:m.start()])
-                        current_item_start = m.end()
-                        current_item_label  = lbl
-                    else:
-                        # ignore inner \item (choices)
-                        pass
-
-            # finalize last item (if file ended without closing)
-            if current_item_start is not None:
-                problem_items.append(tex[current_item_start:])
-
-            self.stdout.write(f"{f.name}: found {len(problem_items)} problem(s).")
-            total_detected += len(problem_items)
-
-            # For each problem item, split stem and choices from inner enumerate
-            for idx, item_text in enumerate(problem_items, 1):
-                mm = ALPH_ENUM_RE.search(item_text)
-                if mm:
-                    stem_md = item_text[:mm.start()].strip()
-                    choices = split_choices_from_body(mm.group("body"))
-                    qtype = "mcq"
-                else:
-                    stem_md = item_text.strip()
-                    choices = {}
-                    qtype = "open"
+        # Stems already in the DB (plus those queued below), loaded once for dedup
+        seen_stems = set()
+        if not opts["dry_run"]:
+            seen_stems = {
+                stem_key(s)
+                for s in Question.objects.values_list("stem_md", flat=True).iterator(chunk_size=2000)
+            }
 
+        for f, problems in zip(files, parse_files(parse_problems, files)):
+            extra_tags = [*infer_tags_from_filename(f.stem), *opts["tag"]]
+
+            self.stdout.write(f"{f.name}: found {len(problems)} problem(s).")
+            total_detected += len(problems)
+
+            for idx, (qtype, stem_md, choices) in enumerate(problems, 1):
                 if opts["dry_run"]:
                     # Show a tiny preview
                     prev = stem_md.replace("\n"," ")[:110]
@@ -128,22 +169,40 @@ class Command(BaseCommand):
                     continue
 
                 # Skip exact duplicate stems (idempotent import)
-                if Question.objects.filter(stem_md=stem_md).exists():
+                key = stem_key(stem_md)
+                if key in seen_stems:
                     continue
-
-                q = Question.objects.create(
-                    type=qtype,
-                    stem_md=stem_md,
-                    choices=choices,
-                    correct={},        # no key in the tex; fill later in admin if desired
-                    created_by=created_by,
-                )
-                for tname in extra_tags:
-                    t, _ = Tag.objects.get_or_create(name=tname)
-                    q.tags.add(t)
-
-                total_created += 1
-                self.stdout.write(f"  ✔ Imported Q{q.id} ({qtype})")
+                seen_stems.add(key)
+                pending.append((qtype, stem_md, choices, extra_tags))
+
+        if not opts["dry_run"]:
+            questions = []
+            with transaction.atomic():
+                if pending:
+                    tags = resolve_tag_ids(name for *_, tag_names in pending for name in tag_names)
+                    questions = create_questions(
+                        [
+                            Question(
+                                type=qtype,
+                                stem_md=stem_md,
+                                choices=choices,
+                                correct={},        # no key in the tex; fill later in admin if desired
+                                created_by=created_by,
+                            )
+                            for qtype, stem_md, choices, _ in pending
+                        ],
+                    )
+                    add_question_tags(
+                        (q.id, tags[name])
+                        for q, (*_, tag_names) in zip(questions, pending)
+                        for name in tag_names
+                    )
+                record_imported("import_mc_enumerate", stamps)  # also refreshes touched-but-identical files
+
+            if questions:
+                # One write for the whole run rather than one per question
+                self.stdout.write("\n".join(f"  ✔ Imported Q{q.id} ({q.type})" for q in questions))
+            total_created = len(questions)
 
         if opts["dry_run"]:
             self.stdout.write(self.style.SUCCESS(f"Dry-run complete. Detected {total_detected} problem(s)."))
@@ -1,70 +1,110 @@
 # practice/management/commands/import_tex.py
 import re
+from itertools import chain, count
 from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
-from practice.models import Question, Tag
+from django.db import transaction
+from practice.models import Question
+from practice.utils.bulk_import import (
+    resolve_tag_ids, create_questions, add_question_tags, parse_files,
+    changed_files, record_imported,
+)
+from practice.utils.regex import compile_linear
 from django.contrib.auth.models import User
 
-# -------- Regexes --------
-HEADER_RE = re.compile(r"^%%\s*(\w+)\s*:\s*(.+)$")
-TOKEN_RE = re.compile(
+# -------- Regexes (RE2 when installed, see practice/utils/regex.py) --------
+# One "%% key: value" line (surrounding blanks allowed, value trimmed), and the
+# run of such lines at the top of a file
+_HEADER_LINE = r"[^\S\n]*%%[^\S\n]*(\w+)[^\S\n]*:[^\S\n]*(\S[^\n]*?)[^\S\n]*(?:\n|\Z)"
+HEADER_RE = compile_linear(_HEADER_LINE)
+HEADER_BLOCK_RE = compile_linear(rf"(?:{_HEADER_LINE})*")
+TOKEN_RE = compile_linear(
     r"\\begin\{(enumerate|itemize)\}|\\end\{(enumerate|itemize)\}|\\item\b",
     re.I | re.M
 )
-ENUM_TOKEN_RE = re.compile(r"(\\begin\{enumerate\})|(\\end\{enumerate\})|(\\item\b)", re.M)
 
 # Shared-asset blocks and per-item uses
-ASSET_BLOCK_RE = re.compile(
+ASSET_BLOCK_RE = compile_linear(
     r"(?is)"
     r"\\begin\{asset\}\{([^}]+)\}\s*"
     r"(.*?)"
     r"\\end\{asset\}\s*"
 )
-USES_RE = re.compile(r"\\uses\{([^}]+)\}", re.I)
+USES_RE = compile_linear(r"\\uses\{([^}]+)\}", re.I)
+
+# Helper patterns, bound once rather than looked up in re's cache per call
+BEGIN_ENUM_RE = re.compile(r"\\begin\{enumerate\}", re.I)
+ANSWER_RE = re.compile(r"\\answer\{([A-Z])\}")
+NESTED_ITEM_SPLIT_RE = re.compile(r"(?m)^\s*\\item\b")
+NOINDENT_RE = re.compile(r"\\noindent\b")
+SKIP_RE = re.compile(r"\\(big|med|small)skip\b")
+TEXTBF_RE = re.compile(r"\\textbf\{([^}]*)\}")
+TEXTMODE_RE = re.compile("|".join(p.pattern for p in (TEXTBF_RE, NOINDENT_RE, SKIP_RE)))
+COMMENT_LINE_RE = re.compile(r"(?m)^[^\S\n]*%.*\n?")
+NONBLANK_RE = re.compile(r"\S")
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Parsed items buffered before each bulk insert
+INSERT_BATCH = 500
 
 
 # -------- Helpers --------
 def _trim(s: str) -> str:
-    return re.sub(r"\s+\Z", "", re.sub(r"\A\s+", "", s or ""))
+    return (s or "").strip()
 
 
-def _strip_answer_marker(s: str):
-    m = re.search(r"\\answer\{([A-Z])\}", s)
+def _strip_answer_marker(s: str, start: int = 0, end: int | None = None):
+    # Works on s[start:end] without slicing it out first; returns (text, answer)
+    end = len(s) if end is None else end
+    m = ANSWER_RE.search(s, start, end)
     if not m:
-        return s, None
-    ans = m.group(1)
-    return s[:m.start()] + s[m.end():], ans
+        return s[start:end], None
+    return "".join((s[start:m.start()], s[m.end():end])), m.group(1)
+
+
+def _textmode_repl(m):
+    # \textbf{...} -> **...** (spacing macros inside it dropped too); others -> ""
+    inner = m.group(1)
+    if inner is None:
+        return ""
+    return "**" + SKIP_RE.sub("", NOINDENT_RE.sub("", inner)) + "**"
 
 
 def _strip_comments_and_textmode_macros(s: str) -> str:
+    s = s or ""
     # Drop pure-comment lines
-    lines = [ln for ln in (s or "").splitlines() if not ln.strip().startswith("%")]
-    s = "\n".join(lines)
-    # Strip common spacing/formatting macros that won't display on web
-    s = re.sub(r"\\noindent\b", "", s)
-    s = re.sub(r"\\(big|med|small)skip\b", "", s)
-    # Soften \textbf to markdown-like bold
-    s = re.sub(r"\\textbf\{([^}]*)\}", r"**\1**", s)
+    if "%" in s:
+        s = COMMENT_LINE_RE.sub("", s)
+    # Strip spacing macros that won't display on web and soften \textbf to
+    # markdown-like bold, all in one pass. Every one starts with a backslash,
+    # so plain-text stems skip the regex entirely.
+    if "\\" in s:
+        s = TEXTMODE_RE.sub(_textmode_repl, s)
     return _trim(s)
 
 
 def _parse_nested_choices(block_text: str):
     # Inside an item's nested enumerate, split on top-level \item's to build choices.
     # Ignore anything before the first \item (e.g. label options).
-    parts = re.split(r"(?m)^\s*\\item\b", block_text)
-    parts = parts[1:]  # drop anything before the first \item
-    parts = [p for p in parts if p.strip()]
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    out = {}
-    for i, p in enumerate(parts):
-        lab = letters[i] if i < len(letters) else str(i + 1)
-        out[lab] = _trim(p)
-    return out
+    # Walk the \item spans; text before the first \item is never sliced out
+    matches = list(NESTED_ITEM_SPLIT_RE.finditer(block_text))
+    ends = [m.start() for m in matches[1:]]
+    ends.append(len(block_text))
+    parts = [p for p in (block_text[m.end():e] for m, e in zip(matches, ends)) if p.strip()]
+    # A..Z, then "27", "28", ... for the (pathological) 27th choice onwards
+    labels = chain(LETTERS, map(str, count(len(LETTERS) + 1)))
+    return {lab: _trim(p) for lab, p in zip(labels, parts)}
 
 
 def _split_top_level_items(body: str):
-    # Find the first top-level \begin{enumerate}
-    m = re.search(r"\\begin\{enumerate\}", body, re.I)
+    # One pass over the body: split the first top-level enumerate into items and,
+    # for each item, remember where its first nested enumerate (the choices) sits.
+    # Returns (preamble, [(start, end, nested), ...]) as offsets into body, so no
+    # item is copied until it is extracted. nested is None or (begin_start,
+    # content_start, content_end); content_end is None when the nested enumerate
+    # is never closed inside the item.
+    m = BEGIN_ENUM_RE.search(body)
     if not m:
         return body, []
 
@@ -76,81 +116,79 @@ def _split_top_level_items(body: str):
     env_stack = ["enumerate"]   # we just entered the top-level enumerate
     enum_depth = 1              # how many enumerate blocks deep we are
     current_start = None
+    nested = None               # [begin_start, content_start, content_end, open_count] of current item
+
+    def flush(end):
+        if NONBLANK_RE.search(body, current_start, end):
+            items.append((current_start, end, tuple(nested[:3]) if nested else None))
 
     for tok in TOKEN_RE.finditer(body, pos):
+        # TOKEN_RE's groups already say which alternative matched
+        begin_env, end_env = tok.groups()
         g = tok.group()
-        m_begin = re.match(r"\\begin\{(enumerate|itemize)\}", g, re.I)
-        m_end   = re.match(r"\\end\{(enumerate|itemize)\}", g, re.I)
-        is_item = g.startswith("\\item")
 
-        if m_begin:
-            env = m_begin.group(1).lower()
+        if begin_env:
+            env = begin_env.lower()
             env_stack.append(env)
             if env == "enumerate":
                 enum_depth += 1
+            if current_start is not None and g == "\\begin{enumerate}":
+                if nested is None:
+                    nested = [tok.start(), tok.end(), None, 1]
+                elif nested[2] is None:
+                    nested[3] += 1
             continue
 
-        if m_end:
-            env = m_end.group(1).lower()
+        if end_env:
+            env = end_env.lower()
             if env_stack:
                 env_stack.pop()
             if env == "enumerate":
                 if enum_depth == 1:
                     # Closing the top-level enumerate: flush last item and stop.
                     if current_start is not None:
-                        items.append(body[current_start:tok.start()])
+                        flush(tok.start())
                         current_start = None
                     break
                 enum_depth -= 1
+            if nested is not None and nested[2] is None and g == "\\end{enumerate}":
+                # The choices block only pairs exact-case begin/end tokens
+                nested[3] -= 1
+                if nested[3] == 0:
+                    nested[2] = tok.start()
             continue
 
-        if is_item:
+        if g == "\\item":   # case-sensitive, unlike the token scan
             # Only split when we're in the OUTER enumerate (depth 1)
             if enum_depth == 1 and env_stack and env_stack[-1] == "enumerate":
                 if current_start is not None:
-                    items.append(body[current_start:tok.start()])
+                    flush(tok.start())
                 current_start = tok.end()
+                nested = None
 
     # If we never saw the end, capture remainder as the last item
     if current_start is not None:
-        items.append(body[current_start:len(body)])
+        flush(len(body))
 
-    return preamble, [_trim(x) for x in items if x.strip()]
+    return preamble, items
 
 
-def _extract_item_stem_and_choices(item_text: str):
-    # For one top-level \item:
+def _extract_item_stem_and_choices(body: str, start: int, end: int, nested):
+    # For one top-level \item, body[start:end] (spans come from _split_top_level_items):
     #  - remove \answer{X} (capture X)
     #  - take first nested enumerate as choices
     #  - return (stem_without_that_enumerate, choices, answer_key)
-    m = re.search(r"\\begin\{enumerate\}", item_text)
-    if not m:
-        stem, ans = _strip_answer_marker(item_text)
+    if nested is None:
+        stem, ans = _strip_answer_marker(body, start, end)
         return _strip_comments_and_textmode_macros(stem), {}, ans
 
-    stem_raw = item_text[:m.start()]
-    rest = item_text[m.start():]
-
-    depth = 0
-    start_idx = end_idx = None
-    for tok in ENUM_TOKEN_RE.finditer(rest):
-        beg, end, itm = tok.groups()
-        if beg:
-            depth += 1
-            if depth == 1:
-                start_idx = tok.end()
-        elif end:
-            if depth == 1:
-                end_idx = tok.start()
-                break
-            depth -= 1
+    begin_start, start_idx, end_idx = nested
 
     choices = {}
-    if start_idx is not None and end_idx is not None:
-        choices_block = rest[start_idx:end_idx]
-        choices = _parse_nested_choices(choices_block)
+    if end_idx is not None:
+        choices = _parse_nested_choices(body[start_idx:end_idx])
 
-    stem_raw, ans = _strip_answer_marker(stem_raw)
+    stem_raw, ans = _strip_answer_marker(body, start, begin_start)
     stem = _strip_comments_and_textmode_macros(stem_raw)
     return stem, choices, ans
 
@@ -173,40 +211,36 @@ def _extract_assets_from_text(s: str):
 
 def _remove_uses_and_collect_keys(s: str):
     # Remove all \uses{key} markers from 's' and return (cleaned_text, [keys]).
-    keys = USES_RE.findall(s or "")
-    cleaned = USES_RE.sub("", s or "")
+    # One scan: the callback collects each key while sub() drops the marker
+    keys = []
+    cleaned = USES_RE.sub(lambda m: keys.append(m.group(1)) or "", s or "")
     return _trim(cleaned), [k.strip() for k in keys if k.strip()]
 
 
 def _prepend_assets(stem: str, assets: dict, keys: list[str]) -> str:
     # Prepend selected asset blocks (dedup, preserve first-seen order) to the stem.
-    seen = set()
-    blocks = []
-    for k in keys:
-        if k not in seen and k in assets:
-            blocks.append(assets[k])
-            seen.add(k)
+    blocks = [assets[k] for k in dict.fromkeys(keys) if k in assets]
     if blocks:
-        return _trim("\n\n".join(blocks + [stem]))
+        blocks.append(stem)
+        return _trim("\n\n".join(blocks))
     return stem
 
 
 # ----------------------- File → Question dicts -----------------------
 def parse_tex_file_to_questions(path: Path):
     text = path.read_text(encoding="utf-8")
-    lines = text.splitlines()
 
-    # Optional meta headers like "%% tags: [foo,bar]"
-    meta, body_start = {}, 0
-    for i, line in enumerate(lines):
-        m = HEADER_RE.match(line.strip())
-        if m:
-            meta[m.group(1).lower()] = m.group(2).strip()
-        else:
-            body_start = i
-            break
+    # Optional meta headers like "%% tags: [foo,bar]": one anchored match finds
+    # where the header block ends, then its lines are read without slicing.
+    # A file that is nothing but headers keeps them in the body (historic behaviour).
+    head_end = HEADER_BLOCK_RE.match(text).end()
+    meta = {
+        m.group(1).lower(): m.group(2)
+        for m in HEADER_RE.finditer(text, 0, head_end)
+    }
+    body_start = head_end if head_end < len(text) else 0
 
-    body = "\n".join(lines[body_start:]).strip()
+    body = text[body_start:].strip()
 
     # Split into preamble + items (preamble before first top-level enumerate)
     preamble, items = _split_top_level_items(body)
@@ -215,21 +249,22 @@ def parse_tex_file_to_questions(path: Path):
     _preamble_wo_assets, assets = _extract_assets_from_text(preamble)
 
     # Tags and type from headers
-    tags = [t.strip() for t in (meta.get("tags", "").strip().strip("[]")).split(",") if t.strip()]
+    # Header values are already trimmed by HEADER_RE, so only the brackets go
+    tags = [t for t in map(str.strip, meta.get("tags", "").strip("[]").split(",")) if t]
     qtype = (meta.get("type") or "mcq").lower()
+    default_answer = (meta.get("answer") or "A").strip().upper()[:1]
 
     if items:
         out = []
-        for it in items:
-            stem, choices, ans_inline = _extract_item_stem_and_choices(it)
+        for start, end, nested in items:
+            stem, choices, ans_inline = _extract_item_stem_and_choices(body, start, end, nested)
             stem_no_uses, use_keys = _remove_uses_and_collect_keys(stem)
             full_stem = _prepend_assets(stem_no_uses, assets, use_keys)
 
-            correct = (ans_inline or meta.get("answer") or "A").strip().upper()[:1]
             out.append({
                 "type": qtype,
                 "tags": tags,
-                "answer": correct,
+                "answer": ans_inline or default_answer,  # ANSWER_RE only captures one A-Z
                 "stem_tex": full_stem,
                 "choices": choices or None,
             })
@@ -241,7 +276,7 @@ def parse_tex_file_to_questions(path: Path):
     return [{
         "type": qtype,
         "tags": tags,
-        "answer": (meta.get("answer") or "A").strip().upper()[:1],
+        "answer": default_answer,
         "stem_tex": stem,
         "choices": None
     }]
@@ -256,6 +291,7 @@ class Command(BaseCommand):
         parser.add_argument("--created-by", type=str, default=None, help="Username to set as author")
         parser.add_argument("--replace", action="store_true", help="Delete existing questions previously imported from each file")
         parser.add_argument("--dry-run", action="store_true", help="Parse and report, but do not write to the database")
+        parser.add_argument("--force", action="store_true", help="Re-import files even if unchanged since the last import")
 
     def handle(self, *args, **opts):
         root = Path(opts["root"]).expanduser().resolve()
@@ -274,45 +310,81 @@ class Command(BaseCommand):
             self.stdout.write("No .tex files found.")
             return
 
-        total = 0
-        for f in files:
-            # Normalize the relative path so tags are consistent across OSes
-            rel = str(f.relative_to(root)).replace("\\", "/")
-            src_tag = f"src:{rel}"
+        # Skip files whose bytes match what the last import recorded
+        changed, stamps = changed_files("import_tex", files)
+        if not opts["force"]:
+            if len(changed) < len(files):
+                self.stdout.write(f"Skipping {len(files) - len(changed)} unchanged file(s).")
+            files = changed
 
-            parsed = parse_tex_file_to_questions(f)
+        total = 0
+        pending = []   # (rel, src_tag, data) rows waiting for the next batch insert
+        tags = {}      # name -> tag id, shared across batches
+        # Parsing is pure CPU work per file; fan it out, then write from here. The
+        # pool starts (and drops DB connections) before the transaction opens.
+        results = parse_files(parse_tex_file_to_questions, files)
+        # One transaction for the whole run; rows are written every INSERT_BATCH
+        # items so memory stays flat however large the corpus is
+        with transaction.atomic():
+            for f, parsed in zip(files, results):
+                # Normalize the relative path so tags are consistent across OSes
+                rel = str(f.relative_to(root)).replace("\\", "/")
+                src_tag = f"src:{rel}"
+
+                if opts["replace"]:
+                    if opts["dry_run"]:
+                        cnt = Question.objects.filter(tags__name=src_tag).count()
+                        self.stdout.write(self.style.WARNING(f"[dry-run] Would delete {cnt} old row(s) for {rel}"))
+                    else:
+                        deleted = Question.objects.filter(tags__name=src_tag).delete()
+                        self.stdout.write(f"Deleted {deleted[0]} old row(s) for {rel}")
 
-            if opts["replace"]:
                 if opts["dry_run"]:
-                    cnt = Question.objects.filter(tags__name=src_tag).count()
-                    self.stdout.write(self.style.WARNING(f"[dry-run] Would delete {cnt} old row(s) for {rel}"))
-                else:
-                    deleted = Question.objects.filter(tags__name=src_tag).delete()
-                    self.stdout.write(f"Deleted {deleted[0]} old row(s) for {rel}")
-
-            if opts["dry_run"]:
-                self.stdout.write(self.style.WARNING(f"[dry-run] Would import {len(parsed)} from {rel}"))
-                total += len(parsed)
-                continue
-
-            # Ensure a source tag exists for this file
-            srcTag, _ = Tag.objects.get_or_create(name=src_tag)
-
-            for data in parsed:
-                q = Question.objects.create(
+                    self.stdout.write(self.style.WARNING(f"[dry-run] Would import {len(parsed)} from {rel}"))
+                    total += len(parsed)
+                    continue
+
+                pending.extend((rel, src_tag, data) for data in parsed)
+                if len(pending) >= INSERT_BATCH:
+                    total += self._insert(pending, tags, created_by)
+
+            if not opts["dry_run"]:
+                total += self._insert(pending, tags, created_by)
+                record_imported("import_tex", stamps)  # also refreshes touched-but-identical files
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Imported {total} question(s)."))
+
+    def _insert(self, pending, tags, created_by) -> int:
+        # Write one batch of parsed items, then empty `pending`
+        if not pending:
+            return 0
+        # Resolve every tag (provided + per-file source tag) not seen in earlier batches
+        tags.update(resolve_tag_ids(
+            name
+            for _, src_tag, data in pending
+            for name in (*data["tags"], src_tag)
+            if name not in tags
+        ))
+        questions = create_questions(
+            [
+                Question(
                     type=data["type"],
                     stem_md=data["stem_tex"],      # store TeX into stem_md as before
                     choices=data["choices"] or {},
                     correct={"choice": data["answer"]},
                     created_by=created_by,
                 )
-                # Attach any provided tags + the source tag
-                for tag_name in data["tags"]:
-                    t, _ = Tag.objects.get_or_create(name=tag_name)
-                    q.tags.add(t)
-                q.tags.add(srcTag)
-
-                total += 1
-                self.stdout.write(f"Imported Q{q.id} from {rel}")
-
-        self.stdout.write(self.style.SUCCESS(f"Done. Imported {total} question(s)."))
+                for _, _, data in pending
+            ],
+        )
+        add_question_tags(
+            (q.id, tags[name])
+            for q, (_, src_tag, data) in zip(questions, pending)
+            for name in (*data["tags"], src_tag)
+        )
+        # One write per batch rather than one per question
+        self.stdout.write("\n".join(
+            f"Imported Q{q.id} from {rel}" for q, (rel, _, _) in zip(questions, pending)
+        ))
+        pending.clear()
+        return len(questions)
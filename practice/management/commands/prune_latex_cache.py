@@ -0,0 +1,56 @@
+# practice/management/commands/prune_latex_cache.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Evict old entries from LATEX_CACHE_DIR: files unused for --max-age-days, then the "
+            "least recently used until the cache fits in --max-mb. Safe to run from cron while "
+            "the app is serving; a removed entry is simply rebuilt on its next request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-days", type=float, default=settings.LATEX_CACHE_MAX_AGE_DAYS)
+        parser.add_argument("--max-mb", type=float, default=settings.LATEX_CACHE_MAX_MB)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be removed")
+
+    def handle(self, *args, **opts):
+        root = settings.LATEX_CACHE_DIR
+        if not os.path.isdir(root):
+            self.stdout.write("No cache directory; nothing to do.")
+            return
+
+        # Cache hits bump the mtime, so it doubles as "last used"
+        entries = []
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        cutoff = time.time() - opts["max_age_days"] * 86400
+        budget = opts["max_mb"] * 1024 * 1024
+        total = sum(size for _, size, _ in entries)
+
+        removed = freed = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= budget:
+                break  # oldest first: everything after this is newer and fits
+            if not opts["dry_run"]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+            freed += size
+
+        verb = "Would remove" if opts["dry_run"] else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} file(s), {freed / 1048576:.1f} MB; {total / 1048576:.1f} MB left."))
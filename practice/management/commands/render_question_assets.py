@@ -0,0 +1,54 @@
+# practice/management/commands/render_question_assets.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from practice.models import Question
+from practice.signals import compute_asset_hash
+from practice.utils.texcache import FORBID_RE, TexRenderError, cached_image, render_to_texcache
+
+
+class Command(BaseCommand):
+    help = ("Render question stems into the tex_svg cache and record the image path on each row, "
+            "so tex_svg?qid= serves a static file. Run after imports (bulk inserts skip the "
+            "save signal) or from cron to drain the render backlog.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many questions")
+
+    def handle(self, *args, **opts):
+        # The backlog flag is covered by the q_needs_render_idx partial index; rows with no
+        # hash yet came in through bulk_create and are hashed here
+        qs = (Question.objects
+              .filter(Q(needs_asset_render=True) | Q(asset_hash=""))
+              .only("stem_md", "asset_hash")
+              .order_by("id"))
+        if opts["limit"]:
+            qs = qs[:opts["limit"]]
+
+        done = failed = 0
+        for q in qs.iterator(chunk_size=200):
+            h = compute_asset_hash(q)
+            tex = q.stem_md or ""
+            path = cached_image(h)
+            # Empty or forbidden stems have nothing to render; that won't change until they're edited
+            settled = path is not None or not tex or bool(FORBID_RE.search(tex))
+            if not settled:
+                try:
+                    path = render_to_texcache(tex, h)
+                    settled = True
+                except TexRenderError as e:
+                    failed += 1
+                    # Bad TeX (422) stays bad until the stem is saved again; a missing
+                    # binary or a timeout is worth another run, so keep those queued
+                    settled = e.permanent
+                    self.stdout.write(self.style.WARNING(f"Q{q.id}: {str(e).splitlines()[0]}"))
+
+            Question.objects.filter(pk=q.pk).update(
+                asset_hash=h,
+                asset_relpath=path.name if path else "",
+                asset_format=path.suffix[1:] if path else "svg",
+                needs_asset_render=not settled,
+            )
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} question(s), {failed} failed."))
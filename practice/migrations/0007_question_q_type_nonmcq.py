@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-15 22:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0006_attemptviewlog_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('type', 'mcq'), _negated=True), fields=['type'], name='q_type_nonmcq'),
+        ),
+    ]
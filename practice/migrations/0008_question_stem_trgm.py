@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# Admin search on stem_md is an icontains lookup, which Django renders on
+# PostgreSQL as UPPER("stem_md"::text) LIKE UPPER('%term%'). A trigram GIN
+# index on that exact expression lets the planner answer it without a seq scan.
+# SQLite (dev) has no pg_trgm, so this is a no-op there.
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS q_stem_trgm ON practice_question "
+        "USING gin (UPPER(stem_md) gin_trgm_ops)"
+    )
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS q_stem_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0007_question_q_type_nonmcq'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
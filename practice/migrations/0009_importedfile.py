@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-15 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0008_question_stem_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importer', models.CharField(max_length=40)),
+                ('path', models.CharField(max_length=500)),
+                ('digest', models.CharField(max_length=128)),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('importer', 'path')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def forwards(apps, schema_editor):
+    # Same repair as the fix_imported_mcq command, run once as a single UPDATE.
+    # The q_type_nonmcq partial index (0007) keeps the scan to non-MCQ rows.
+    Question = apps.get_model("practice", "Question")
+    Question.objects.filter(~Q(choices=None), ~Q(choices={}), ~Q(type="mcq")).update(type="mcq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0009_importedfile'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
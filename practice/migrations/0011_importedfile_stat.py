@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-15 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0010_fix_imported_mcq_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importedfile',
+            name='mtime_ns',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importedfile',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-15 23:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0011_importedfile_stat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='asset_format',
+            field=models.CharField(blank=True, default='svg', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='asset_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='asset_relpath',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='needs_asset_render',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['content_hash'], name='practice_qu_content_1e37af_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('needs_asset_render', True)), fields=['needs_asset_render'], name='q_needs_render_idx'),
+        ),
+    ]
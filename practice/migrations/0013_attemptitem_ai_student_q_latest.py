@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-15 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0012_question_asset_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attemptitem',
+            index=models.Index(fields=['student', 'question', '-created_at'], name='ai_student_q_latest'),
+        ),
+    ]
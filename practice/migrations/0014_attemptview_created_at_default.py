@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-15 23:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0013_attemptitem_ai_student_q_latest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attemptview',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
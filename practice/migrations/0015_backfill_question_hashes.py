@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from django.db import migrations
+from django.db.models import Q
+
+# Questions written by the bulk importers before they stamped hashes have empty
+# content_hash/asset_hash. Fill both, and queue the ones without an asset hash for
+# render_question_assets. Frozen copies of signals._compute_content_hash and
+# signals.compute_asset_hash, so later edits there don't change this migration.
+
+BATCH = 500
+
+
+def _content_hash(q):
+    payload = {"stem_md": q.stem_md or "", "choices": q.choices or {}, "type": q.type or ""}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def forwards(apps, schema_editor):
+    Question = apps.get_model("practice", "Question")
+    qs = (Question.objects
+          .filter(Q(content_hash="") | Q(asset_hash=""))
+          .only("stem_md", "choices", "type", "content_hash", "asset_hash", "needs_asset_render"))
+    batch = []
+    for q in qs.iterator(chunk_size=BATCH):
+        q.content_hash = _content_hash(q)
+        if not q.asset_hash:
+            q.asset_hash = hashlib.sha1((q.stem_md or "").encode("utf-8")).hexdigest()
+            q.needs_asset_render = True
+        batch.append(q)
+        if len(batch) >= BATCH:
+            Question.objects.bulk_update(batch, ["content_hash", "asset_hash", "needs_asset_render"])
+            batch = []
+    Question.objects.bulk_update(batch, ["content_hash", "asset_hash", "needs_asset_render"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0014_attemptview_created_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
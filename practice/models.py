@@ -1,17 +1,11 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.text import slugify
 
-# --- LaTeX asset fields ---
-content_hash      = models.CharField(max_length=64, blank=True, default="")
-asset_hash        = models.CharField(max_length=64, blank=True, default="")
-asset_relpath     = models.CharField(max_length=255, blank=True, default="")  # e.g. q/57/abc123.svg
-asset_format      = models.CharField(max_length=8, blank=True, default="svg") # 'svg' (or 'png')
-needs_asset_render = models.BooleanField(default=False)
-
 
 class Classroom(models.Model):
     name = models.CharField(max_length=200)
@@ -61,6 +55,23 @@ class Question(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    # --- LaTeX asset fields ---
+    content_hash      = models.CharField(max_length=64, blank=True, default="")
+    asset_hash        = models.CharField(max_length=64, blank=True, default="")
+    asset_relpath     = models.CharField(max_length=255, blank=True, default="")  # file in TEXCACHE_DIR, e.g. <sha1>.svg
+    asset_format      = models.CharField(max_length=8, blank=True, default="svg") # 'svg' (or 'png')
+    needs_asset_render = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Partial index: fix_imported_mcq only ever looks at non-MCQ rows
+            models.Index(fields=["type"], name="q_type_nonmcq", condition=~Q(type="mcq")),
+            models.Index(fields=["content_hash"]),
+            # Only the render backlog is indexed, so polling it stays O(backlog)
+            models.Index(fields=["needs_asset_render"], name="q_needs_render_idx",
+                         condition=Q(needs_asset_render=True)),
+        ]
+
     def __str__(self):
         return f"Q{self.id} v{self.version}"
 
@@ -83,11 +94,18 @@ class AttemptItem(models.Model):
     diag_snapshot = models.JSONField(default=list, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Serves the "latest answer per question" window in latest_incorrects
+            models.Index(fields=["student", "question", "-created_at"], name="ai_student_q_latest"),
+        ]
+
 class AttemptView(models.Model):
     attempt  = models.ForeignKey('Attempt',  on_delete=models.CASCADE, related_name='views')
     question = models.ForeignKey('Question', on_delete=models.CASCADE, related_name='views')
     view_ms  = models.PositiveIntegerField()  # accumulated milliseconds per view session
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default, not auto_now_add: rows are buffered, and auto_now_add would stamp flush time
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
@@ -119,9 +137,8 @@ def ensure_student_profile(sender, instance, created, **kwargs):
     and assign a friendly SID like 'S000123'.
     """
     if created:
-        profile = StudentProfile.objects.create(user=instance)
-        profile.sid = f"S{instance.id:06d}"
-        profile.save()
+        # The user id is already known here, so write the SID in the same INSERT
+        StudentProfile.objects.create(user=instance, sid=f"S{instance.id:06d}")
 
 class AttemptViewLog(models.Model):
     attempt  = models.ForeignKey('Attempt', on_delete=models.CASCADE, related_name='view_logs')
@@ -137,3 +154,19 @@ class AttemptViewLog(models.Model):
     def __str__(self):
         return f'Attempt {self.attempt_id} Q{self.question_id}: {self.view_ms} ms'
 
+
+
+class ImportedFile(models.Model):
+    """Content digest of a .tex file as of its last successful import, per importer."""
+    importer = models.CharField(max_length=40)           # management command name
+    path = models.CharField(max_length=500)              # absolute path at import time
+    digest = models.CharField(max_length=128)            # blake2b hex of the file bytes
+    size = models.BigIntegerField(default=0)             # st_size / st_mtime_ns at import time,
+    mtime_ns = models.BigIntegerField(default=0)         # lets unchanged files skip hashing
+    imported_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("importer", "path")
+
+    def __str__(self):
+        return f"{self.importer}: {self.path}"
@@ -0,0 +1,22 @@
+# practice/renderers.py
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON via orjson for the payload-heavy endpoints (long TeX stems). orjson writes
+    bytes straight away instead of building a str and encoding it; types it doesn't
+    know (lazy strings, Decimals, ...) go through DRF's usual encoder.
+    """
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    _fallback = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=self._fallback, option=orjson.OPT_NON_STR_KEYS)
@@ -9,7 +9,8 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ["id", "type", "stem_md", "choices", "version", "tags"]
 
     def get_tags(self, obj):
-        return list(obj.tags.values_list("name", flat=True))
+        # Reads the prefetch cache when the queryset did prefetch_related("tags")
+        return [t.name for t in obj.tags.all()]
 
 class AttemptSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,8 +1,11 @@
 import hashlib, json
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save
 from django.dispatch import receiver
-from django.conf import settings
 from .models import Question
+from .utils.texcache import tex_hash
+
+# Fields that feed the content hash
+HASHED_FIELDS = {"stem_md", "choices", "type"}
 
 def _compute_content_hash(q: Question) -> str:
     payload = {
@@ -12,11 +15,26 @@ def _compute_content_hash(q: Question) -> str:
     }
     return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
 
-@receiver(pre_save, sender=Question)
-def set_content_hash(sender, instance: Question, **kwargs):
-    instance.content_hash = _compute_content_hash(instance)
+def compute_asset_hash(q: Question) -> str:
+    # Same key tex_svg uses for its TEXCACHE_DIR files, so both paths share one cache
+    return tex_hash(q.stem_md or "")
+
+def stamp_hashes(q: Question) -> None:
+    """Fill content_hash/asset_hash on a Question. bulk_create skips pre_save,
+    so bulk insert paths call this themselves (see utils.bulk_import)."""
+    q.content_hash = _compute_content_hash(q)
 
-@receiver(post_save, sender=Question)
-def flag_render_needed(sender, instance, created, **kwargs):
-    # No-op until asset fields & feature flag are in place
-    return
+    # A new stem means a new image: forget the old one and queue it for
+    # render_question_assets
+    asset_hash = compute_asset_hash(q)
+    if asset_hash != q.asset_hash:
+        q.asset_hash = asset_hash
+        q.asset_relpath = ""
+        q.needs_asset_render = True
+
+@receiver(pre_save, sender=Question)
+def set_content_hash(sender, instance: Question, update_fields=None, **kwargs):
+    # save(update_fields=[...]) that leaves stem/choices/type alone can't change the hash
+    if update_fields is not None and not HASHED_FIELDS.intersection(update_fields):
+        return
+    stamp_hashes(instance)
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from practice.models import Attempt, AttemptViewLog, Question
+from practice.views import user_is_teacher
+from practice.utils import bulk_import
+from practice.utils.write_buffer import VIEW_MS_MAX, BulkWriteBuffer, clamp_view_ms
+
+TEX_ITEM = (
+    "\\begin{enumerate}\n"
+    "\\item Question %d: what is $x^%d$ at $x=1$?\n"
+    "\\begin{enumerate}\n"
+    "\\item $1$\n"
+    "\\item $2$\n"
+    "\\end{enumerate}\n"
+    "\\end{enumerate}\n"
+)
+
+
+def write_tex_files(root: Path, n: int) -> None:
+    for i in range(n):
+        (root / f"q{i:03d}.tex").write_text(TEX_ITEM % (i, i), encoding="utf-8")
+
+
+# TransactionTestCase: the importers open their own transaction, and the
+# regression below is about what happens outside of one
+class ImportTexTests(TransactionTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def import_tex(self, *args):
+        call_command("import_tex", str(self.root), *args, stdout=StringIO())
+
+    def test_small_import(self):
+        write_tex_files(self.root, 3)
+        self.import_tex()
+        self.assertEqual(Question.objects.count(), 3)
+        q = Question.objects.get(tags__name="src:q001.tex")
+        self.assertEqual(q.type, "mcq")
+        self.assertEqual(q.choices, {"A": "$1$", "B": "$2$"})
+        # bulk_create skips pre_save; the importer fills the hashes itself
+        self.assertEqual(len(q.content_hash), 64)
+        self.assertEqual(len(q.asset_hash), 40)
+        self.assertTrue(q.needs_asset_render)
+
+    def test_unchanged_files_are_skipped(self):
+        write_tex_files(self.root, 3)
+        self.import_tex()
+        self.import_tex()
+        self.assertEqual(Question.objects.count(), 3)
+        self.import_tex("--force", "--replace")
+        self.assertEqual(Question.objects.count(), 3)
+
+    def test_parallel_import_closes_connections_outside_transaction(self):
+        # At PARALLEL_MIN_FILES+ files the parser forks a pool and drops DB connections
+        # first; doing that inside the import transaction used to kill the run with
+        # "Cannot operate on a closed database". The in-memory test DB ignores close(),
+        # so also check where the close happens.
+        write_tex_files(self.root, bulk_import.PARALLEL_MIN_FILES + 8)
+        in_atomic = []
+        close_all = connections.close_all
+
+        def spy():
+            in_atomic.append(connection.in_atomic_block)
+            close_all()
+
+        with mock.patch.object(bulk_import.connections, "close_all", side_effect=spy):
+            self.import_tex()
+
+        self.assertEqual(in_atomic, [False])
+        self.assertEqual(Question.objects.count(), bulk_import.PARALLEL_MIN_FILES + 8)
+
+
+class PruneLatexCacheTests(SimpleTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def entry(self, name, days_old, size=1024 * 1024):
+        path = self.root / name[:2] / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"%" * size)
+        t = time.time() - days_old * 86400
+        os.utime(path, (t, t))
+        return path
+
+    def test_evicts_stale_then_least_recently_used(self):
+        stale = self.entry("aa-stale.pdf", 40)
+        older = self.entry("bb-older.pdf", 5)
+        newer = self.entry("cc-newer.pdf", 1)
+        with override_settings(LATEX_CACHE_DIR=self.root):
+            call_command("prune_latex_cache", "--max-age-days", "30", "--max-mb", "1", stdout=StringIO())
+        self.assertFalse(stale.exists())
+        self.assertFalse(older.exists())
+        self.assertTrue(newer.exists())
+
+
+class BulkWriteBufferTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("buf")
+        self.attempt = Attempt.objects.create(student=user)
+        self.question = Question.objects.create(stem_md="x", type="short", correct={})
+
+    def row(self, ms):
+        return AttemptViewLog(attempt=self.attempt, question=self.question, view_ms=ms)
+
+    def test_bad_row_only_drops_itself(self):
+        buf = BulkWriteBuffer(AttemptViewLog)
+        for ms in (1, 2, 10**20, 3):
+            buf.add(self.row(ms))
+        with self.assertLogs("practice.utils.write_buffer", "WARNING"):
+            buf.flush()
+        self.assertEqual(sorted(AttemptViewLog.objects.values_list("view_ms", flat=True)), [1, 2, 3])
+
+    def test_clamp_view_ms(self):
+        self.assertEqual(clamp_view_ms("250"), 250)
+        self.assertEqual(clamp_view_ms(-5), 0)
+        self.assertEqual(clamp_view_ms(10**20), VIEW_MS_MAX)
+
+
+class TeacherCheckTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("t")
+        self.teachers = Group.objects.create(name="Teachers")
+
+    def test_membership_changes_apply_immediately(self):
+        self.assertFalse(user_is_teacher(self.user))
+        self.user.groups.add(self.teachers)
+        self.assertTrue(user_is_teacher(self.user))
+        self.user.groups.remove(self.teachers)
+        self.assertFalse(user_is_teacher(self.user))
+        self.teachers.user_set.add(self.user)
+        self.assertTrue(user_is_teacher(self.user))
+        self.teachers.user_set.clear()
+        self.assertFalse(user_is_teacher(self.user))
+        self.user.groups.add(self.teachers)
+        self.assertTrue(user_is_teacher(self.user))
+        self.teachers.delete()
+        self.assertFalse(user_is_teacher(self.user))
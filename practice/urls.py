@@ -22,8 +22,10 @@ urlpatterns = [
     path("api/students/<int:student_id>/wrong-questions/", views.latest_incorrects, name="latest_incorrects"),
     path("api/students/<int:student_id>/wrong-questions/pdf", views.wrong_questions_pdf, name="wrong_questions_pdf"),
 
-    # LaTeX compile endpoint (PDF only)
+    # LaTeX compile endpoints
     path("practice/tex/pdf/", tex_pdf, name="tex_pdf"),
+    path("practice/tex/svg/", views.tex_svg, name="tex_svg"),
+    path("api/questions/<int:pk>/asset.<str:fmt>", views.question_asset, name="question_asset"),
 
     # Stats API (single, correct one)
     path("api/stats/me/", stats_me, name="stats_me"),
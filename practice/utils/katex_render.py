@@ -1,6 +1,6 @@
 # practice/utils/katex_render.py
 import re
-import markdown
+import threading
 
 # We’ll use the markdown-katex extension
 KATEX_EXT = 'markdown_katex'
@@ -17,25 +17,39 @@ KATEX_CFG = {
 INLINE_RE = re.compile(r'\$(.+?)\$', flags=re.S)           # $ ... $
 BLOCK_RE  = re.compile(r'\$\$(.+?)\$\$', flags=re.S)       # $$ ... $$
 
+def _block_sub(m):  # $$...$$ -> ```math ... ```
+    return '```math\n' + m.group(1).strip() + '\n```'
+
+def _inline_sub(m): # $...$   -> $`...`$
+    inner = m.group(1).strip()
+    # avoid touching already converted $`...`$
+    if inner.startswith('`') and inner.endswith('`'):
+        return m.group(0)
+    return '$`' + inner + '`$'
+
 def to_gitlab_math(md_text: str) -> str:
-    def block_sub(m):  # $$...$$ -> ```math ... ```
-        return '```math\n' + m.group(1).strip() + '\n```'
-    def inline_sub(m): # $...$   -> $`...`$
-        inner = m.group(1).strip()
-        # avoid touching already converted $`...`$
-        if inner.startswith('`') and inner.endswith('`'):
-            return m.group(0)
-        return '$`' + inner + '`$'
-
-    # Do blocks first so inner $...$ aren’t double-processed
-    out = BLOCK_RE.sub(block_sub, md_text)
-    out = INLINE_RE.sub(inline_sub, out)
-    return out
+    # Text without any $ has nothing to convert
+    if '$' not in md_text:
+        return md_text
+    # Do blocks first so inner $...$ aren’t double-processed. (A single
+    # alternation pass would pair adjacent spans like "$x$$$y$$" differently.)
+    out = BLOCK_RE.sub(_block_sub, md_text) if '$$' in md_text else md_text
+    return INLINE_RE.sub(_inline_sub, out)
+
+# Markdown instances are reusable (via reset()) but not thread-safe, so keep
+# one per thread, built on first use.
+_local = threading.local()
+
+def _markdown():
+    md = getattr(_local, 'md', None)
+    if md is None:
+        import markdown  # heavy; only paid by processes that actually render
+        md = _local.md = markdown.Markdown(
+            extensions=['extra', KATEX_EXT],
+            extension_configs={KATEX_EXT: KATEX_CFG}
+        )
+    return md
 
 def render_md_with_katex(md_text: str) -> str:
     """Returns HTML where LaTeX has been rendered to KaTeX HTML (no JS needed)."""
-    md = markdown.Markdown(
-        extensions=['extra', KATEX_EXT],
-        extension_configs={KATEX_EXT: KATEX_CFG}
-    )
-    return md.convert(to_gitlab_math(md_text))
+    return _markdown().reset().convert(to_gitlab_math(md_text))
@@ -1,9 +1,12 @@
-import os, shutil, subprocess, tempfile, textwrap, logging
+import os, shutil, subprocess, tempfile, textwrap, logging, hashlib
+from functools import lru_cache
 from django.conf import settings
 log = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
 def _find_exe(name: str):
-    # Prefer vendored binaries in ./bin, else PATH
+    # Prefer vendored binaries in ./bin, else PATH. Resolved once per process;
+    # a missing binary is cached as None, so restart after installing one.
     here_bin = os.path.join(settings.BASE_DIR, "bin", name)
     if os.path.isfile(here_bin) and os.access(here_bin, os.X_OK):
         return here_bin
@@ -21,84 +24,218 @@ def _pdftocairo():
         raise RuntimeError("pdftocairo not found (install poppler-utils in Docker)")
     return exe
 
-def build_tex_for_question(stem_md: str, choices: dict) -> str:
-    """Standalone doc that renders the question stem + (optional) choices."""
-    # We purposely keep deps small: lmodern + amsmath + enumitem + array/booktabs if you need tables
-    # Math is expected in TeX ($...$, \[...\]) already.
-    choices_block = ""
-    if choices:
-        lines = ["\\begin{enumerate}[label=(\\Alph*)]"]
-        for key in sorted(choices.keys()):
-            lines.append(f"\\item {choices[key]}")
-        lines.append("\\end{enumerate}")
-        choices_block = "\n".join(lines)
-
-    # Use 'standalone' for tight bounding box; fallback to article if you prefer.
-    return textwrap.dedent(rf"""
+def _cache_key(tex_source: str) -> str:
+    return hashlib.blake2b(tex_source.encode("utf-8"), digest_size=16).hexdigest()
+
+def _cache_path(key: str, ext: str) -> str:
+    # Fan out on the first two hex chars so no single directory gets huge
+    return os.path.join(settings.LATEX_CACHE_DIR, key[:2], f"{key}.{ext}")
+
+def _cache_store(src: str, cache_path: str) -> None:
+    """Copy a finished artifact into the cache; os.replace keeps concurrent writers safe."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, cache_path)
+
+def _cache_hit(cache_path: str) -> bool:
+    """True if cache_path exists; bumps its mtime so prune_latex_cache evicts least recently used first."""
+    try:
+        os.utime(cache_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def cached_pdf(tex_source: str, build) -> bytes:
+    """PDF for tex_source from the content cache, or build(tex_source) and cache the bytes."""
+    cached = _cache_path(_cache_key(tex_source), "pdf")
+    if _cache_hit(cached):
+        with open(cached, "rb") as f:
+            return f.read()
+    pdf = build(tex_source)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, cached)
+    except OSError:
+        # A full or read-only cache dir shouldn't fail the render itself
+        log.warning("could not write LaTeX cache entry %s", cached, exc_info=True)
+    return pdf
+
+def _place_from_cache(cached: str, dest: str) -> None:
+    """
+    Hardlink a cached artifact to dest (no bytes copied); falls back to a copy when
+    dest_dir is on another filesystem than LATEX_CACHE_DIR. Cache files are only ever
+    replaced, never edited in place, so sharing the inode is safe.
+    """
+    try:
+        if os.path.samefile(cached, dest):
+            return  # already linked; rename() onto the same inode would be a no-op
+    except FileNotFoundError:
+        pass
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        os.link(cached, tmp)
+    except OSError:
+        shutil.copyfile(cached, tmp)
+    os.replace(tmp, dest)
+
+# Use 'standalone' for a tight bounding box; one question per document.
+# We purposely keep deps small: lmodern + amsmath + enumitem + array/booktabs if you need tables
+_QUESTION_PREAMBLE = textwrap.dedent(r"""
     \documentclass[border=6pt,varwidth=0.95\linewidth]{standalone}
-    \usepackage[T1]{{fontenc}}
-    \usepackage[utf8]{{inputenc}}
-    \usepackage{{lmodern}}
-    \usepackage{{amsmath,amssymb}}
-    \usepackage{{enumitem}}
-    \usepackage{{array,booktabs}}
+    \usepackage[T1]{fontenc}
+    \usepackage[utf8]{inputenc}
+    \usepackage{lmodern}
+    \usepackage{amsmath,amssymb}
+    \usepackage{enumitem}
+    \usepackage{array,booktabs}
     \begin{document}
-    \begin{{minipage}}{{0.95\linewidth}}
-    {stem_md}
+    """).lstrip()
+
+def _choice_items(choices: dict) -> tuple:
+    """Hashable, key-sorted form of a choices dict (the lru_cache key below)."""
+    return tuple(sorted(choices.items())) if choices else ()
+
+def _choices_block(choice_items: tuple) -> str:
+    if not choice_items:
+        return ""
+    items = "".join(f"\\item {text}\n" for _, text in choice_items)
+    return f"\\begin{{enumerate}}[label=(\\Alph*)]\n{items}\\end{{enumerate}}"
+
+def _question_document(body: str) -> str:
+    return (
+        _QUESTION_PREAMBLE
+        + "\\begin{minipage}{0.95\\linewidth}\n"
+        + body
+        + "\\end{minipage}\n"
+        + "\\end{document}"
+    )
+
+@lru_cache(maxsize=4096)
+def _build_tex_cached(stem_md: str, choice_items: tuple) -> str:
+    # Math is expected in TeX ($...$, \[...\]) already.
+    return _question_document(f"{stem_md}\n\n{_choices_block(choice_items)}\n")
+
+def build_tex_for_question(stem_md: str, choices: dict) -> str:
+    """Standalone doc that renders the question stem + (optional) choices."""
+    return _build_tex_cached(stem_md, _choice_items(choices))
+
+# Scratch space for the TeX -> PDF -> SVG hops: RAM-backed /dev/shm when the host has it
+_SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+# Convert the PDF to SVG in-process with pymupdf when it is installed (LATEX_PYMUPDF=0
+# forces the pdftocairo subprocess instead). Optional and deliberately not in
+# requirements.txt: it is AGPL-licensed, so install it only where that is acceptable.
+USE_PYMUPDF = os.environ.get("LATEX_PYMUPDF", "1") != "0"
+
+# Feed TeX to Tectonic on stdin (job name "texput") instead of writing doc.tex first.
+# Set LATEX_STDIN=0 to go back to the temp .tex file if a Tectonic build mishandles "-".
+USE_STDIN_TEX = os.environ.get("LATEX_STDIN", "1") != "0"
+
+def _tectonic_input(tex_source: str, td: str):
+    """Return (input arg, stdin text, pdf path) for compiling tex_source inside td."""
+    if USE_STDIN_TEX:
+        return "-", tex_source, os.path.join(td, "texput.pdf")
+    tex_path = os.path.join(td, "doc.tex")
+    with open(tex_path, "w", encoding="utf-8") as f:
+        f.write(tex_source)
+    return tex_path, None, os.path.join(td, "doc.pdf")
 
-    {choices_block}
-    \end{{minipage}}
-    \end{document}
-    """).strip()
+def _run(cmd, cwd=None, input_text: str = None) -> None:
+    subprocess.run(cmd, check=True, cwd=cwd, capture_output=True,
+                   input=None if input_text is None else input_text.encode("utf-8"))
+
+def _tectonic_pdf(tex_source: str, td: str) -> str:
+    """Compile tex_source with Tectonic into td and return the PDF path."""
+    tex_arg, stdin_text, pdf_path = _tectonic_input(tex_source, td)
+    cmd_pdf = [_tectonic(), "-q", "--outdir", td, tex_arg]
+    _run(cmd_pdf, cwd=td, input_text=stdin_text)
+
+    if not os.path.exists(pdf_path):
+        raise RuntimeError("Tectonic did not produce a PDF")
+    return pdf_path
+
+def _pdf_to_svg(pdf_path: str, svg_path: str) -> None:
+    cmd_svg = [_pdftocairo(), "-svg", pdf_path, svg_path]
+    _run(cmd_svg)
+    if not os.path.exists(svg_path):
+        raise RuntimeError("pdftocairo did not produce SVG")
+
+def _pymupdf():
+    """pymupdf module for in-process PDF -> SVG, or None to shell out to pdftocairo."""
+    if not USE_PYMUPDF:
+        return None
+    try:
+        import pymupdf
+    except ImportError:
+        return None
+    return pymupdf
+
+def _pdf_to_svg_pymupdf(pymupdf, pdf_path: str, svg_path: str) -> None:
+    with pymupdf.open(pdf_path) as doc:
+        if doc.page_count < 1:
+            raise RuntimeError("PDF has no pages")
+        with open(svg_path, "w", encoding="utf-8") as f:
+            f.write(doc[0].get_svg_image(text_as_path=True))
+
+def _compile_svg(tex_source: str, cached: str) -> None:
+    """Compile one standalone document and store its SVG in the cache at `cached`."""
+    with tempfile.TemporaryDirectory(dir=_SCRATCH_DIR) as td:
+        pdf_path = _tectonic_pdf(tex_source, td)
+        svg_tmp = os.path.join(td, "doc.svg")
+        pymupdf = _pymupdf()
+        if pymupdf is not None:
+            _pdf_to_svg_pymupdf(pymupdf, pdf_path, svg_tmp)
+        else:
+            _pdf_to_svg(pdf_path, svg_tmp)
+        _cache_store(svg_tmp, cached)
 
 def compile_to_svg(tex_source: str, dest_dir: str, base_name: str) -> str:
     """
     Compile tex_source to PDF via Tectonic, then to SVG via pdftocairo.
+    Finished SVGs are cached by source hash, so re-rendering unchanged TeX is a file copy.
     Returns absolute path to SVG.
     """
     os.makedirs(dest_dir, exist_ok=True)
-    with tempfile.TemporaryDirectory() as td:
-        tex_path = os.path.join(td, "doc.tex")
-        with open(tex_path, "w", encoding="utf-8") as f:
-            f.write(tex_source)
-
-        # 1) PDF via Tectonic
-        cmd_pdf = [_tectonic(), "-q", "--outdir", td, tex_path]
-        subprocess.run(cmd_pdf, check=True, cwd=td)
-
-        pdf_path = os.path.join(td, "doc.pdf")
-        if not os.path.exists(pdf_path):
-            raise RuntimeError("Tectonic did not produce doc.pdf")
-
-        # 2) SVG via pdftocairo
-        svg_out = os.path.join(dest_dir, f"{base_name}.svg")
-        cmd_svg = [_pdftocairo(), "-svg", pdf_path, svg_out]
-        subprocess.run(cmd_svg, check=True)
-
-        if not os.path.exists(svg_out):
-            raise RuntimeError("pdftocairo did not produce SVG")
-        return svg_out
-    
-def compile_tex(tex_source: str, timeout: int = 60) -> bytes:
+    svg_out = os.path.join(dest_dir, f"{base_name}.svg")
+    cached = _cache_path(_cache_key(tex_source), "svg")
+    if not _cache_hit(cached):
+        _compile_svg(tex_source, cached)
+    _place_from_cache(cached, svg_out)
+    return svg_out
+
+def compile_tex(tex_source: str, timeout: int = 60, cache: bool = True) -> bytes:
     """
     Compile a LaTeX string to PDF bytes using the system 'tectonic' binary.
     Relies on existing helper '_tectonic()' to find the binary.
+    With cache=True PDFs go through cached_pdf, so a hit skips Tectonic entirely;
+    pass cache=False for one-off documents that shouldn't pile up in LATEX_CACHE_DIR.
     Raises FileNotFoundError, subprocess.TimeoutExpired, or CalledProcessError.
     """
+    if cache:
+        return cached_pdf(tex_source, lambda src: _compile_tex(src, timeout))
+    return _compile_tex(tex_source, timeout)
+
+def _compile_tex(tex_source: str, timeout: int) -> bytes:
     tectonic = _tectonic()  # your existing helper; should raise if not found
-    with tempfile.TemporaryDirectory() as tmpd:
-        tex_path = os.path.join(tmpd, "doc.tex")
-        pdf_path = os.path.join(tmpd, "doc.pdf")
-        with open(tex_path, "w", encoding="utf-8") as f:
-            f.write(tex_source)
+    with tempfile.TemporaryDirectory(dir=_SCRATCH_DIR) as tmpd:
+        tex_arg, stdin_text, pdf_path = _tectonic_input(tex_source, tmpd)
 
+        # Engine chatter on stdout is discarded; errors arrive on stderr, which is
+        # only decoded when the compile actually failed. No synctex/log files:
+        # nothing reads them before the temp dir goes away.
         proc = subprocess.run(
-            [tectonic, "--keep-logs", "--synctex", "--outdir", tmpd, tex_path],
-            capture_output=True, text=True, timeout=timeout
+            [tectonic, "--outdir", tmpd, tex_arg],
+            input=None if stdin_text is None else stdin_text.encode("utf-8"),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout
         )
         if proc.returncode != 0:
-            log.error("LaTeX compile failed rc=%s\nSTDERR:\n%s", proc.returncode, proc.stderr)
-            raise subprocess.CalledProcessError(proc.returncode, proc.args, output=proc.stdout, stderr=proc.stderr)
+            stderr = proc.stderr.decode("utf-8", "replace")
+            log.error("LaTeX compile failed rc=%s\nSTDERR:\n%s", proc.returncode, stderr)
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr)
 
         with open(pdf_path, "rb") as f:
             return f.read()
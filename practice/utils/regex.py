@@ -0,0 +1,22 @@
+# practice/utils/regex.py
+import re
+
+# Optional: google-re2 (`pip install google-re2`) matches in linear time, so
+# scanning malformed .tex input can never backtrack catastrophically.
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+_INLINE_FLAGS = ((re.I, "i"), (re.M, "m"), (re.S, "s"))
+
+
+def compile_linear(pattern: str, flags: int = 0):
+    """Compile `pattern` with RE2 when available and supported, else with `re`."""
+    if re2 is not None:
+        inline = "".join(ch for flag, ch in _INLINE_FLAGS if flags & flag)
+        try:
+            return re2.compile(f"(?{inline}){pattern}" if inline else pattern)
+        except re2.error:
+            pass  # lookarounds/backrefs etc. are not RE2 syntax
+    return re.compile(pattern, flags)
@@ -0,0 +1,137 @@
+# practice/utils/texcache.py
+"""
+Snippet -> SVG/PNG rendering into the tex_svg image cache, shared by the tex_svg
+view and the render_question_assets command. Files are named by the sha1 of the
+snippet, so a Question's asset_hash doubles as its cache key.
+"""
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from .latex_assets import _find_exe
+
+# Where to cache compiled images (put this under STATIC or MEDIA)
+TEXCACHE_DIR = Path(settings.BASE_DIR) / "static" / "texcache"
+TEXCACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+_STANDALONE_PREAMBLE = r"""
+\documentclass[preview,border=2pt]{standalone}
+\usepackage[T1]{fontenc}
+\usepackage{amsmath,amssymb,mathtools}
+\usepackage{booktabs}
+\usepackage{tikz,pgfplots,tcolorbox}
+\pgfplotsset{compat=1.18}
+\begin{document}
+%s
+\end{document}
+"""
+
+# Light forbid regex (tectonic disables shell-escape already)
+FORBID_RE = re.compile(r"\\(write|openout|input\s*\{[^}]*\}|usepackage\[.*?\]\{shellesc\})", re.I)
+
+
+class TexRenderError(Exception):
+    """A snippet could not be rendered into TEXCACHE_DIR; carries the HTTP status to report.
+    422 means the TeX itself is bad; other statuses are toolchain trouble worth retrying."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def permanent(self) -> bool:
+        return self.status == 422
+
+
+def tex_hash(tex: str) -> str:
+    return hashlib.sha1(tex.encode("utf-8")).hexdigest()
+
+
+def cached_image(h: str):
+    """The cached <h>.svg, else <h>.png, else None."""
+    for ext in ("svg", "png"):
+        path = TEXCACHE_DIR / f"{h}.{ext}"
+        if path.exists():
+            return path
+    return None
+
+
+def content_type(path: Path) -> str:
+    return "image/svg+xml" if path.suffix == ".svg" else "image/png"
+
+
+def _convert(cmd) -> int:
+    # A missing converter counts as a failed conversion, not a crash
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+    except FileNotFoundError:
+        return 127
+
+
+def render_to_texcache(tex: str, h: str) -> Path:
+    """
+    Compile a LaTeX snippet to TEXCACHE_DIR/<h>.svg (or <h>.png when the SVG
+    conversion fails) and return the cached file. Raises TexRenderError.
+    """
+    exe = _find_exe("tectonic")
+    if not exe:
+        raise TexRenderError("tectonic_not_found", 500)
+
+    # Wrap in standalone document
+    wrapper = _STANDALONE_PREAMBLE % tex
+
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            tex_file = Path(td) / "doc.tex"
+            tex_file.write_text(wrapper, encoding="utf-8")
+
+            env = os.environ.copy()
+            env.setdefault("TEXMFHOME", str(Path(td) / "texmf"))
+
+            # Compile to PDF with Tectonic (modern CLI first, fall back to legacy)
+            cmd_modern = [exe, "-X", "compile", str(tex_file), "--outdir", td, "--synctex=0", "--keep-logs"]
+            proc = subprocess.run(cmd_modern, cwd=td, env=env, stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, text=True, timeout=30)
+            if proc.returncode != 0:
+                cmd_legacy = [exe, str(tex_file), "--outdir", td, "--synctex=0", "--keep-logs"]
+                proc2 = subprocess.run(cmd_legacy, cwd=td, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, text=True, timeout=30)
+                if proc2.returncode != 0:
+                    raise TexRenderError("tectonic_failed:\n"+proc.stdout+"\n"+proc2.stdout, 422)
+
+            pdf = Path(td) / "doc.pdf"
+
+            # Converters write straight into the cache dir under a per-request temp name and
+            # os.replace publishes the result: no copy back through Python, and concurrent
+            # requests for the same snippet can't clobber each other's temp file.
+            TEXCACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_base = TEXCACHE_DIR / f"{h}.{uuid.uuid4().hex}"
+
+            # Try PDF -> SVG via poppler (pdftocairo). One page expected due to standalone.
+            svg_path = TEXCACHE_DIR / f"{h}.svg"
+            svg_tmp = tmp_base.with_name(tmp_base.name + ".svg")
+            rc = _convert(["pdftocairo", "-svg", str(pdf), str(svg_tmp)])
+            if rc == 0 and svg_tmp.exists():
+                svg_tmp.replace(svg_path)
+                return svg_path
+            svg_tmp.unlink(missing_ok=True)
+
+            # Fallback to PNG (pdftoppm), only when the SVG conversion failed
+            png_path = TEXCACHE_DIR / f"{h}.png"
+            rc = _convert(["pdftoppm", "-png", "-singlefile", "-rx", "200", "-ry", "200",
+                           str(pdf), str(tmp_base)])
+            png_tmp = tmp_base.with_name(tmp_base.name + ".png")
+            if rc == 0 and png_tmp.exists():
+                png_tmp.replace(png_path)
+                return png_path
+            png_tmp.unlink(missing_ok=True)
+
+            raise TexRenderError("convert_failed", 500)
+    except subprocess.TimeoutExpired:
+        raise TexRenderError("latex_timeout", 504)
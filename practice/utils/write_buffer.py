@@ -0,0 +1,82 @@
+# practice/utils/write_buffer.py
+import atexit
+import logging
+import threading
+
+from django.db import DatabaseError, close_old_connections, transaction
+
+log = logging.getLogger(__name__)
+
+# Errors a single bad row can raise on insert: DatabaseError covers IntegrityError
+# and DataError; SQLite raises OverflowError for ints past 64 bits
+ROW_ERRORS = (DatabaseError, ValueError, OverflowError)
+
+# Largest value PositiveIntegerField accepts on every backend (PostgreSQL integer)
+VIEW_MS_MAX = 2147483647
+
+
+def clamp_view_ms(value) -> int:
+    """Coerce a client-reported view time into the range the view_ms columns accept."""
+    return min(max(0, int(value)), VIEW_MS_MAX)
+
+
+class BulkWriteBuffer:
+    """
+    In-process write-behind queue for high-volume, low-value rows (view logs).
+    Unsaved instances are collected in memory and inserted with bulk_create by a
+    daemon thread every `interval` seconds, or as soon as `batch_size` rows wait.
+    Whatever is still queued at interpreter exit is flushed by an atexit hook.
+    """
+
+    def __init__(self, model, batch_size: int = 500, interval: float = 2.0):
+        self.model = model
+        self.batch_size = batch_size
+        self.interval = interval
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, obj) -> None:
+        with self._lock:
+            self._rows.append(obj)
+            full = len(self._rows) >= self.batch_size
+            if self._thread is None:
+                # Started lazily so forked workers each get their own writer
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.model.__name__}-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(rows, batch_size=self.batch_size)
+        except ROW_ERRORS:
+            # Some row is bad (missing FK, out-of-range value); retry one by one so
+            # only the offenders are dropped, not everyone else's rows in the batch
+            for obj in rows:
+                try:
+                    with transaction.atomic():
+                        obj.save(force_insert=True)
+                except ROW_ERRORS as e:
+                    log.warning("Dropping %s (%s): %s", self.model.__name__, e, obj)
+        return len(rows)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Flushing %s buffer failed", self.model.__name__)
+            finally:
+                close_old_connections()
@@ -1,5 +1,4 @@
 # practice/views.py
-from collections import OrderedDict
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.models import User
@@ -9,9 +8,10 @@ from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, Http
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_GET
 from django.conf import settings
-from django.db.models import Sum, Avg
+from django.db import connection
+from django.db.models import Avg, Count, Exists, F, OuterRef, Prefetch, Q, Sum, Window
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status, permissions
 
@@ -23,39 +23,58 @@ import tempfile
 import subprocess
 import shutil, logging
 import hashlib
+import random
+from functools import lru_cache
 
-from django.db.models.functions import Random
+from django.db.models.functions import FirstValue, RowNumber
+from django.contrib.postgres.expressions import ArraySubquery
 
 from .models import Question, Attempt, AttemptItem, Tag, AttemptView
 from .forms import StudentSignupForm
+from .renderers import ORJSONRenderer
 from django.template.loader import render_to_string
 from pathlib import Path
 
 import json
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from .views_tex import compile_tex_bytes
-from .utils.latex_assets import compile_tex
+from .utils.latex_assets import cached_pdf, compile_tex
+from .utils.texcache import (
+    FORBID_RE, TEXCACHE_DIR, TexRenderError, cached_image, render_to_texcache, tex_hash,
+    content_type as texcache_ctype,
+)
+from .utils.write_buffer import BulkWriteBuffer, clamp_view_ms
 
 
 logger = logging.getLogger(__name__)
 
+# View-time beacons arrive in bursts; they are queued and inserted in batches
+# instead of one INSERT per POST (see attempt_view_log)
+VIEW_BUFFER = BulkWriteBuffer(AttemptView, batch_size=500, interval=0.5)
+
+# <br> tags and TeX \\ line breaks (but not \\[, \\(, \\{) become a space
+_TEX_BREAK_RE = re.compile(r'<br\s*/?>|\\\\(?!\[|\(|\{)', re.I)
+# Then: any newline, or any run of 2+ whitespace chars, becomes one space. Same result
+# as collapsing "\s*\n+\s*" and then "\s{2,}" in two separate passes.
+_TEX_SPACE_RE = re.compile(r'\s{2,}|\n')
+
 def _normalize_tex(s: str) -> str:
     if not s:
         return s
-    s = re.sub(r'<br\s*/?>', ' ', s, flags=re.I)
-    s = re.sub(r'\\\\(?!\[|\(|\{)', ' ', s)      # \\ -> space (not \\\[, \\\(, \\\{)
-    s = re.sub(r'\s*\n+\s*', ' ', s)             # collapse newlines
-    s = re.sub(r'\s{2,}', ' ', s)                # collapse multi-spaces
+    s = _TEX_BREAK_RE.sub(' ', s)
+    s = _TEX_SPACE_RE.sub(' ', s)
     return s.strip()
 
 
 # --- helpers -----------------------------------------------------------------
 def user_is_teacher(user):
-    # Staff or member of "Teachers" group count as teachers
+    # Staff or member of "Teachers" group count as teachers. Not cached: this gates
+    # access, and a per-worker copy would outlive a revoked membership.
     return user.is_staff or user.groups.filter(name="Teachers").exists()
 
 
@@ -77,6 +96,14 @@ def evaluate_answer(q: Question, submitted: dict) -> bool:
     return False
 
 def _render_latex_pdf(tex_source: str) -> bytes:
+    """
+    Compile LaTeX to PDF using Tectonic, reusing the cached PDF when the same
+    source was compiled before (TeX output is deterministic for a given input).
+    """
+    return cached_pdf(tex_source, _compile_latex_pdf)
+
+
+def _compile_latex_pdf(tex_source: str) -> bytes:
     """
     Compile LaTeX to PDF using Tectonic.
     Tries modern '-X compile' first; falls back to legacy '<file> --outdir ...'.
@@ -152,16 +179,8 @@ def create_attempt(request):
     return Response({"attempt_id": attempt.id}, status=status.HTTP_201_CREATED)
 
 
-# Submit an answer: owner of the attempt OR a teacher
-@api_view(["POST"])
-@permission_classes([permissions.IsAuthenticated])
-def submit_attempt_item(request, attempt_id: int):
-    attempt = get_object_or_404(Attempt, id=attempt_id)
-    if attempt.student_id != request.user.id and not user_is_teacher(request.user):
-        return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
-
-    q = get_object_or_404(Question, id=request.data.get("question_id"))
-    submitted = request.data.get("answer") or {}
+def _build_attempt_item(attempt, q: Question, submitted: dict) -> AttemptItem:
+    """Unsaved AttemptItem for `submitted`; `q` should have its tags prefetched."""
     is_correct = evaluate_answer(q, submitted)
 
     diag = []
@@ -170,73 +189,154 @@ def submit_attempt_item(request, attempt_id: int):
         if key in q.diagnostic_keys:
             diag = [q.diagnostic_keys[key]]
 
-    item = AttemptItem.objects.create(
+    return AttemptItem(
         attempt=attempt,
-        student=attempt.student,
+        student_id=attempt.student_id,
         question=q,
         question_version=q.version,
         submitted=submitted,
         is_correct=is_correct,
-        tags_snapshot=list(q.tags.values_list("name", flat=True)),
+        tags_snapshot=[t.name for t in q.tags.all()],
         diag_snapshot=diag,
     )
-    return Response({"is_correct": is_correct, "attempt_item_id": item.id}, status=status.HTTP_201_CREATED)
+
+
+# Submit an answer: owner of the attempt OR a teacher.
+# Body is either {"question_id", "answer"} or {"items": [{"question_id", "answer"}, ...]};
+# the batch form loads all questions + tags in two queries and inserts in one.
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def submit_attempt_item(request, attempt_id: int):
+    attempt = get_object_or_404(Attempt, id=attempt_id)
+    if attempt.student_id != request.user.id and not user_is_teacher(request.user):
+        return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+    questions = Question.objects.prefetch_related(Prefetch("tags", queryset=Tag.objects.only("name")))
+
+    batch = request.data.get("items")
+    if batch is None:
+        q = get_object_or_404(questions, id=request.data.get("question_id"))
+        item = _build_attempt_item(attempt, q, request.data.get("answer") or {})
+        item.save(force_insert=True)
+        return Response({"is_correct": item.is_correct, "attempt_item_id": item.id}, status=status.HTTP_201_CREATED)
+
+    if not isinstance(batch, list):
+        return Response({"detail": "items must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        qids = [int(entry["question_id"]) for entry in batch]
+    except (TypeError, KeyError, ValueError):
+        return Response({"detail": "each item needs an integer question_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    q_by_id = questions.in_bulk(qids)
+    missing = sorted(set(qids) - q_by_id.keys())
+    if missing:
+        return Response({"detail": f"Unknown question(s): {missing}"}, status=status.HTTP_404_NOT_FOUND)
+
+    items = [
+        _build_attempt_item(attempt, q_by_id[qid], entry.get("answer") or {})
+        for qid, entry in zip(qids, batch)
+    ]
+    AttemptItem.objects.bulk_create(items, batch_size=100)
+    return Response({
+        "results": [
+            {"question_id": it.question_id, "is_correct": it.is_correct, "attempt_item_id": it.id}
+            for it in items
+        ]
+    }, status=status.HTTP_201_CREATED)
 
 
 # Only me or a teacher can view my still-missed
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
+@renderer_classes([ORJSONRenderer])
 def latest_incorrects(request, student_id: int):
     if student_id != request.user.id and not user_is_teacher(request.user):
         return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-    items = (
-        AttemptItem.objects
-        .filter(student_id=student_id)
-        .select_related("question")
-        .order_by("question_id", "created_at")  # we'll keep the last seen per question
+    rows = _latest_wrong_items(student_id).values(
+        "question_id", *(f"question__{f}" for f in ("type", "stem_md", "choices", "version"))
     )
-
-    latest_by_q = OrderedDict()
-    for it in items:
-        latest_by_q[it.question_id] = it
+    rows = list(rows)
+    tags = _tag_names_by_question([r["question_id"] for r in rows])
 
     wrong = []
-    for it in latest_by_q.values():
-        if not it.is_correct:
-            q = it.question
-            wrong.append({
-                "id": q.id,
-                "type": q.type,
-                "stem_md": q.stem_md or "",
-                "choices": q.choices or {},
-                "version": q.version,
-                "tags": list(q.tags.values_list("name", flat=True)),
-            })
+    for r in rows:
+        wrong.append({
+            "id": r["question_id"],
+            "type": r["question__type"],
+            "stem_md": r["question__stem_md"] or "",
+            "choices": r["question__choices"] or {},
+            "version": r["question__version"],
+            "tags": tags.get(r["question_id"], []),
+        })
 
     return Response({"count": len(wrong), "questions": wrong})
 
 
 
+def _tag_names_by_question(question_ids) -> dict:
+    """{question_id: [tag name, ...]} for the given questions, from one query on the M2M table."""
+    names = {}
+    links = (
+        Question.tags.through.objects
+        .filter(question_id__in=question_ids)
+        .order_by("id")
+        .values_list("question_id", "tag__name")
+    )
+    for qid, name in links:
+        names.setdefault(qid, []).append(name)
+    return names
+
+
+def _random_ids(qs, k: int) -> list:
+    """
+    Up to k distinct, uniformly random ids from qs, picked in the database: draw k row
+    positions out of the eligible count and fetch just the ids at those positions
+    (ROW_NUMBER over id), so the eligible ids never travel to Python. Two queries.
+    """
+    n = qs.values("id").count()  # DISTINCT over the id alone, not every column
+    if not n:
+        return []
+    if k * 2 >= n:
+        # Most of the pool goes out anyway; one id list is cheaper than numbering it
+        ids = list(qs.values_list("id", flat=True))
+        return random.sample(ids, min(k, len(ids)))
+
+    positions = random.sample(range(1, n + 1), k)
+    # Number distinct questions (qs may carry a tag join plus .distinct())
+    numbered = (
+        Question.objects.filter(id__in=qs.values("id"))
+        .annotate(pos=Window(RowNumber(), order_by=F("id").asc()))
+        .filter(pos__in=positions)
+        .values_list("pos", "id")
+    )
+    at = dict(numbered)
+    return [at[p] for p in positions if p in at]
+
+
 def _descendant_tags_by_name(name: str):
     """Return Tag queryset including the tag named `name` and all its descendants."""
-    try:
-        root = Tag.objects.get(name__iexact=name)
-    except Tag.DoesNotExist:
+    # One recursive CTE instead of a query per tree node. UNION (not UNION ALL)
+    # also stops the walk if a parent loop ever sneaks into the data.
+    table = connection.ops.quote_name(Tag._meta.db_table)
+    with connection.cursor() as cur:
+        cur.execute(
+            f"WITH RECURSIVE d(id) AS ("
+            f"  SELECT id FROM {table} WHERE UPPER(name) = UPPER(%s)"
+            f"  UNION"
+            f"  SELECT t.id FROM {table} t JOIN d ON t.parent_id = d.id"
+            f") SELECT id FROM d",
+            [name],
+        )
+        ids = [row[0] for row in cur.fetchall()]
+    if not ids:
         return Tag.objects.none()
-
-    ids = [root.id]
-    stack = [root]
-    while stack:
-        t = stack.pop()
-        children = list(Tag.objects.filter(parent=t))
-        ids.extend(ch.id for ch in children)
-        stack.extend(children)
     return Tag.objects.filter(id__in=ids)
 
 
 @api_view(["GET"])
 @permission_classes([permissions.AllowAny])
+@renderer_classes([ORJSONRenderer])
 def get_questions(request):
     try:
         tag = request.query_params.get("tag", "").strip()
@@ -265,10 +365,9 @@ def get_questions(request):
         if tag:
             allowed_tags = _descendant_tags_by_name(tag)
             if subjects_qs is not None:
-                # intersect with student's allowed subjects (parent or child)
-                allowed_ids = list(allowed_tags.values_list("id", flat=True))
-                subject_ids = list(subjects_qs.values_list("id", flat=True))
-                if not set(allowed_ids) & set(subject_ids):
+                # intersect with student's allowed subjects (parent or child);
+                # a single EXISTS instead of pulling both id lists into Python
+                if not allowed_tags.filter(id__in=subjects_qs).exists():
                     return Response({"count": 0, "questions": []})
             qs = qs.filter(tags__in=allowed_tags).distinct()
         else:
@@ -279,26 +378,36 @@ def get_questions(request):
         if exclude_ids:
             qs = qs.exclude(id__in=exclude_ids)
 
-        # Random pick from remaining
-        qs = qs.order_by(Random())[:max(1, limit)]
-
-        def _norm(s: str) -> str:
-            if not s: return ""
-            s = re.sub(r'<br\s*/?>',' ', s, flags=re.I)
-            s = re.sub(r'\\\\(?!\[|\(|\{)',' ', s)
-            s = re.sub(r'\s*\n+\s*',' ', s)
-            s = re.sub(r'\s{2,}',' ', s)
-            return s.strip()
+        # Random pick from remaining: pick row positions instead of having the DB
+        # compute and sort random() over every full row, then load the picks
+        picked = _random_ids(qs, max(1, limit))
+        page = Question.objects.filter(id__in=picked)
+        fields = ("id", "type", "stem_md", "choices", "version")
+        if connection.vendor == "postgresql":
+            # Tag names ride along as an array column of the same query
+            page = page.annotate(tag_names=ArraySubquery(
+                Question.tags.through.objects
+                .filter(question_id=OuterRef("pk"))
+                .order_by("id")
+                .values("tag__name")
+            ))
+            by_id = {r["id"]: r for r in page.values(*fields, "tag_names")}
+            tags = {qid: r["tag_names"] for qid, r in by_id.items()}
+        else:
+            # Other backends: tag names for the page in one more query
+            by_id = {r["id"]: r for r in page.values(*fields)}
+            tags = _tag_names_by_question(picked)
+        rows = [by_id[qid] for qid in picked if qid in by_id]
 
         out = []
-        for q in qs:
+        for r in rows:
             out.append({
-                "id": q.id,
-                "type": q.type,
-                "stem_md": q.stem_md or "",   # keep raw; frontend handles TeX/HTML
-                "choices": (q.choices or {}),
-                "version": q.version,
-                "tags": list(q.tags.values_list("name", flat=True)),
+                "id": r["id"],
+                "type": r["type"],
+                "stem_md": r["stem_md"] or "",   # keep raw; frontend handles TeX/HTML
+                "choices": (r["choices"] or {}),
+                "version": r["version"],
+                "tags": tags.get(r["id"], []),
             })
 
         return Response({"count": len(out), "questions": out})
@@ -325,17 +434,32 @@ def teacher_page(request):
 
 
 # --- PDF helpers + views -----------------------------------------------------
-def _latest_wrong_questions(student_id: int):
-    items = (
+def _latest_wrong_items(student_id: int):
+    """
+    The student's most recent AttemptItem per question, kept only where that answer
+    was wrong; ordered by question id. The dedup runs in SQL (ROW_NUMBER over each
+    question's items, newest first) instead of streaming the whole history.
+    """
+    newest_first = {
+        "partition_by": [F("question_id")],
+        "order_by": [F("created_at").desc(), F("id").desc()],
+    }
+    return (
         AttemptItem.objects
         .filter(student_id=student_id)
+        # latest_ok repeats the newest row's is_correct as a window value so the
+        # filter lands outside the window subquery rather than pre-filtering it
+        .annotate(rn=Window(RowNumber(), **newest_first),
+                  latest_ok=Window(FirstValue("is_correct"), **newest_first))
+        .filter(rn=1, latest_ok=False)
         .select_related("question")
-        .order_by("question_id", "created_at")
+        .order_by("question_id")
     )
-    latest = OrderedDict()
-    for it in items:
-        latest[it.question_id] = it
-    return [it.question for it in latest.values() if not it.is_correct]
+
+
+def _latest_wrong_questions(student_id: int):
+    items = _latest_wrong_items(student_id).only("question_id", "question__stem_md", "question__choices")
+    return [it.question for it in items]
 
 
 def _make_pdf(student_id: int, questions):
@@ -360,14 +484,14 @@ def _make_pdf(student_id: int, questions):
     else:
         for i, q in enumerate(questions, start=1):
             text = f"Q{i}. {q.stem_md}"
-            # basic wrap
+            # basic wrap: walk fixed-width slice offsets instead of re-slicing the tail
             max_chars = 95
-            while len(text) > max_chars:
-                c.drawString(x, y, text[:max_chars]); y -= 0.25 * inch
-                text = text[max_chars:]
+            last = max(0, (len(text) - 1) // max_chars * max_chars)
+            for start in range(0, last, max_chars):
+                c.drawString(x, y, text[start:start + max_chars]); y -= 0.25 * inch
                 if y < 1 * inch:
                     c.showPage(); y = H - 1 * inch; c.setFont("Helvetica", 11)
-            c.drawString(x, y, text); y -= 0.35 * inch
+            c.drawString(x, y, text[last:]); y -= 0.35 * inch
             if y < 1 * inch:
                 c.showPage(); y = H - 1 * inch; c.setFont("Helvetica", 11)
 
@@ -381,9 +505,10 @@ def _make_pdf(student_id: int, questions):
 # ----- TECTONIC (LaTeX) PATH -------------------------------------------------
 TECTONIC_BIN = os.getenv("TECTONIC_BIN", "tectonic")
 
+@lru_cache(maxsize=1)
 def _tectonic_path():
-    """Return path to tectonic binary (project ./bin or PATH), or None."""
-    from django.conf import settings
+    """Return path to tectonic binary (project ./bin or PATH), or None.
+    Resolved once per process."""
     local = os.path.join(settings.BASE_DIR, "bin", "tectonic")
     if os.path.isfile(local) and os.access(local, os.X_OK):
         return local
@@ -395,37 +520,8 @@ def _render_latex_pdf_from_template(template_name: str, ctx: dict) -> bytes:
     Render a Django .tex template and compile it to PDF with Tectonic.
     Raises on failure. Callers should catch and fallback.
     """
-    exe = _tectonic_path()
-    if not exe:
-        raise RuntimeError("tectonic_not_found")
-
     tex_source = render_to_string(template_name, ctx)
-
-    with tempfile.TemporaryDirectory() as td:
-        tex_path = os.path.join(td, "doc.tex")
-        with open(tex_path, "w", encoding="utf-8") as f:
-            f.write(tex_source)
-
-        env = os.environ.copy()
-        env.setdefault("TEXMFHOME", os.path.join(td, "texmf"))
-
-        # Prefer modern subcommand first; fall back to legacy syntax.
-        # (No "-q" because your binary does not support it.)
-        cmd_modern = [exe, "-X", "compile", tex_path, "--outdir", td, "--synctex=0", "--keep-logs"]
-        proc = subprocess.run(
-            cmd_modern, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=td, env=env
-        )
-        if proc.returncode != 0:
-            cmd_legacy = [exe, tex_path, "--outdir", td, "--synctex=0", "--keep-logs"]
-            proc2 = subprocess.run(
-                cmd_legacy, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=td, env=env
-            )
-            if proc2.returncode != 0:
-                raise RuntimeError(f"tectonic_failed\n{proc.stdout}\n{proc2.stdout}")
-
-        pdf_path = os.path.join(td, "doc.pdf")
-        with open(pdf_path, "rb") as fh:
-            return fh.read()
+    return _render_latex_pdf(tex_source)
 
 
 
@@ -507,11 +603,22 @@ def wrong_questions_pdf(request, student_id: int):
         # Render LaTeX
         tex = render_to_string("print/missed_problems.tex", ctx)
 
-        # Compile with Tectonic (strict; no fallback)
-        pdf_bytes = compile_tex(tex)
+        # Same TeX -> same PDF, so the source hash doubles as the ETag; a browser
+        # re-downloading an unchanged packet gets a 304 without touching Tectonic
+        etag = f'"{hashlib.sha256(tex.encode("utf-8")).hexdigest()}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        # Compile with Tectonic (strict; no fallback). Packets are per student, so
+        # they stay out of the PDF cache; the ETag above already covers re-downloads
+        pdf_bytes = compile_tex(tex, cache=False)
 
         resp = HttpResponse(pdf_bytes, content_type="application/pdf")
         resp["Content-Disposition"] = f'attachment; filename="still_missed_student_{student_id}.pdf"'
+        resp["ETag"] = etag
+        # Per-student content: browsers may keep it but must revalidate, shared caches may not
+        resp["Cache-Control"] = "private, no-cache"
         return resp
 
     except FileNotFoundError as e:
@@ -593,35 +700,28 @@ def student_dashboard(request):
     )
 
 
-def _tectonic_path():
-    """Return path to tectonic binary (./bin or PATH)."""
-    local = os.path.join(settings.BASE_DIR, "bin", "tectonic")
-    if os.path.isfile(local) and os.access(local, os.X_OK):
-        return local
-    return shutil.which("tectonic")
-
-# Where to cache compiled images (put this under STATIC or MEDIA)
-TEXCACHE_DIR = Path(settings.BASE_DIR) / "static" / "texcache"
-TEXCACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-_STANDALONE_PREAMBLE = r"""
-\documentclass[preview,border=2pt]{standalone}
-\usepackage[T1]{fontenc}
-\usepackage{amsmath,amssymb,mathtools}
-\usepackage{booktabs}
-\usepackage{tikz,pgfplots,tcolorbox}
-\pgfplotsset{compat=1.18}
-\begin{document}
-%s
-\end{document}
-"""
-
 # Heuristic: if the snippet uses environments that MathJax can't render, we want full LaTeX.
 _NEEDS_FULL_LATEX_RE = re.compile(
     r"\\begin\{(tabular|array|align\*?|tcolorbox|tikzpicture|axis)\}|\\includegraphics|\\pgfplotstableread",
     re.I
 )
 
+def _send_texcache(path: Path, content_type: str):
+    """
+    Serve a file from TEXCACHE_DIR. Behind nginx, set TEXCACHE_ACCEL_PREFIX to an
+    `internal` location aliased to the cache dir and nginx streams it itself;
+    otherwise FileResponse goes out through gunicorn's wsgi.file_wrapper (sendfile).
+    """
+    prefix = settings.TEXCACHE_ACCEL_PREFIX
+    if prefix:
+        resp = HttpResponse(content_type=content_type)
+        resp["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{path.name}"
+    else:
+        resp = FileResponse(open(path, "rb"), content_type=content_type)
+    resp["Cache-Control"] = "private, max-age=31536000, immutable"
+    return resp
+
+@login_required
 @require_GET
 def tex_svg(request):
     """
@@ -631,140 +731,84 @@ def tex_svg(request):
       - qid: optional, to pull Question.stem_md from DB instead
     Returns: image/svg+xml (or image/png fallback)
     """
-    # --- NEW: light forbid regex (tectonic disables shell-escape already) ---
-    _FORBID_RE = re.compile(r"\\(write|openout|input\s*\{[^}]*\}|usepackage\[.*?\]\{shellesc\})", re.I)
-
     tex = request.GET.get("tex")
+    q = None
     if not tex and (qid := request.GET.get("qid")):
         try:
-            q = Question.objects.get(pk=int(qid))
+            q = Question.objects.only("stem_md", "asset_relpath").get(pk=int(qid))
         except (ValueError, Question.DoesNotExist):
             return HttpResponseBadRequest("bad qid")
         tex = q.stem_md or ""
+        # Already rendered: straight to the file, as long as it was rendered from this
+        # stem. The stored asset_hash can lag behind writes that skip the save signal
+        # (queryset.update, raw SQL), so the hash is recomputed rather than trusted.
+        h = tex_hash(tex)
+        if q.asset_relpath.startswith(f"{h}."):
+            path = TEXCACHE_DIR / q.asset_relpath
+            if path.exists():
+                return _send_texcache(path, texcache_ctype(path))
 
     if not tex:
         return HttpResponseBadRequest("missing tex")
 
     # --- NEW: block a few risky primitives ---
-    if _FORBID_RE.search(tex):
+    if FORBID_RE.search(tex):
         return HttpResponse("forbidden_tex", status=400)
 
     # Hash for caching
-    h = hashlib.sha1(tex.encode("utf-8")).hexdigest()
-    svg_path = TEXCACHE_DIR / f"{h}.svg"
-    png_path = TEXCACHE_DIR / f"{h}.png"
+    h = tex_hash(tex)
 
     # Serve cached if present (with long cache headers)
-    if svg_path.exists():
-        resp = FileResponse(open(svg_path, "rb"), content_type="image/svg+xml")
-        resp["Cache-Control"] = "public, max-age=31536000, immutable"
-        return resp
-    if png_path.exists():
-        resp = FileResponse(open(png_path, "rb"), content_type="image/png")
-        resp["Cache-Control"] = "public, max-age=31536000, immutable"
-        return resp
-
-    exe = _tectonic_path()
-    if not exe:
-        return HttpResponse("tectonic_not_found", status=500)
-
-    # Wrap in standalone document
-    wrapper = _STANDALONE_PREAMBLE % tex
-
-    try:
-        with tempfile.TemporaryDirectory() as td:
-            tex_file = Path(td) / "doc.tex"
-            tex_file.write_text(wrapper, encoding="utf-8")
-
-            env = os.environ.copy()
-            env.setdefault("TEXMFHOME", str(Path(td) / "texmf"))
-
-            # Compile to PDF with Tectonic (modern CLI first, fall back to legacy)
-            cmd_modern = [exe, "-X", "compile", str(tex_file), "--outdir", td, "--synctex=0", "--keep-logs"]
-            proc = subprocess.run(cmd_modern, cwd=td, env=env, stdout=subprocess.PIPE,
-                                  stderr=subprocess.STDOUT, text=True, timeout=30)
-            if proc.returncode != 0:
-                cmd_legacy = [exe, str(tex_file), "--outdir", td, "--synctex=0", "--keep-logs"]
-                proc2 = subprocess.run(cmd_legacy, cwd=td, env=env, stdout=subprocess.PIPE,
-                                       stderr=subprocess.STDOUT, text=True, timeout=30)
-                if proc2.returncode != 0:
-                    return HttpResponse("tectonic_failed:\n"+proc.stdout+"\n"+proc2.stdout,
-                                        status=422, content_type="text/plain")
-
-            pdf = Path(td) / "doc.pdf"
-
-            # Try PDF -> SVG via poppler (pdftocairo). One page expected due to standalone.
-            svg_tmp = Path(td) / "doc.svg"
-            rc = subprocess.run(["pdftocairo", "-svg", str(pdf), str(svg_tmp)],
-                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).returncode
-            if rc == 0 and svg_tmp.exists():
-                TEXCACHE_DIR.mkdir(parents=True, exist_ok=True)
-                # --- NEW: atomic write to avoid race on concurrent requests ---
-                tmp_out = svg_path.with_suffix(".svg.tmp")
-                tmp_out.write_bytes(svg_tmp.read_bytes())
-                tmp_out.replace(svg_path)
-                resp = FileResponse(open(svg_path, "rb"), content_type="image/svg+xml")
-                resp["Cache-Control"] = "public, max-age=31536000, immutable"
-                return resp
-
-            # Fallback to PNG (pdftoppm)
-            png_tmp = Path(td) / "doc"
-            rc = subprocess.run(["pdftoppm", "-png", "-singlefile", "-rx", "200", "-ry", "200",
-                                 str(pdf), str(png_tmp)],
-                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).returncode
-            png_file = png_tmp.with_suffix(".png")
-            if rc == 0 and png_file.exists():
-                TEXCACHE_DIR.mkdir(parents=True, exist_ok=True)
-                tmp_out = png_path.with_suffix(".png.tmp")
-                tmp_out.write_bytes(png_file.read_bytes())
-                tmp_out.replace(png_path)
-                resp = FileResponse(open(png_path, "rb"), content_type="image/png")
-                resp["Cache-Control"] = "public, max-age=31536000, immutable"
-                return resp
-
-            return HttpResponse("convert_failed", status=500, content_type="text/plain")
-    except subprocess.TimeoutExpired:
-        return HttpResponse("latex_timeout", status=504, content_type="text/plain")
+    path = cached_image(h)
+    if path is None:
+        try:
+            path = render_to_texcache(tex, h)
+        except TexRenderError as e:
+            return HttpResponse(str(e), status=e.status, content_type="text/plain")
+
+    if q is not None:
+        # Remember where this stem's image lives so the next qid request skips straight to it;
+        # matching on stem_md skips the write if the stem was edited meanwhile
+        Question.objects.filter(pk=q.pk, stem_md=q.stem_md).update(
+            asset_hash=h, asset_relpath=path.name, asset_format=path.suffix[1:], needs_asset_render=False,
+        )
+    return _send_texcache(path, texcache_ctype(path))
 
+@login_required
+@require_GET
 def question_asset(request, pk: int, fmt: str = "svg"):
-    q = Question.objects.filter(pk=pk).first()
+    q = Question.objects.filter(pk=pk).only("stem_md", "asset_relpath", "asset_format").first()
     if not q or not q.asset_relpath:
         raise Http404("No asset")
+    # The image is named after the stem it was rendered from; a stem edited through a
+    # path that skips the save signal leaves a stale image behind, so check it here
+    if not q.asset_relpath.startswith(f"{tex_hash(q.stem_md or '')}."):
+        raise Http404("Asset out of date")
     # only serve correct format
     if (q.asset_format or "svg") != fmt:
         raise Http404("Format mismatch")
-    abs_path = os.path.join(settings.ASSET_ROOT, q.asset_relpath)
-    if not os.path.isfile(abs_path):
+    # asset_relpath is recorded relative to the tex_svg cache (render_question_assets)
+    abs_path = TEXCACHE_DIR / q.asset_relpath
+    try:
+        st = abs_path.stat()
+    except FileNotFoundError:
         raise Http404("Asset missing")
-    ctype = "image/svg+xml" if fmt == "svg" else "image/png"
-    return FileResponse(open(abs_path, "rb"), content_type=ctype)
 
-@csrf_exempt
-@require_POST
-def log_attempt_view(request, attempt_id):
-    """
-    Records a view slice (in ms) for a question within an attempt.
-    Safe: if AttemptView model isn't present, returns ok without saving.
-    """
-    try:
-        data = json.loads(request.body or "{}")
-        question_id = int(data.get("question_id") or 0)
-        view_ms = max(0, int(data.get("view_ms") or 0))
-    except Exception:
-        return JsonResponse({"ok": False, "error": "bad-json"}, status=400)
+    # The file name is the stem's content hash, so it doubles as a strong ETag;
+    # repeat loads revalidate and get a 304 instead of the image again
+    etag = f'"{abs_path.stem}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if not_modified is not None:
+        return not_modified
 
-    # If you don't want persistence yet, this already returns 200 OK.
-    # If the model exists, we'll try to save; if it doesn't, we just no-op.
-    try:
-        from .models import AttemptView, Attempt, Question  # may not exist yet
-        att = Attempt.objects.get(id=attempt_id)
-        q   = Question.objects.get(id=question_id)
-        AttemptView.objects.create(attempt=att, question=q, view_ms=view_ms)
-        return JsonResponse({"ok": True, "saved": True})
-    except Exception as e:
-        # Swallow missing model / lookup issues so frontend never breaks
-        return JsonResponse({"ok": True, "saved": False, "note": str(e)})
-    
+    ctype = "image/svg+xml" if fmt == "svg" else "image/png"
+    resp = FileResponse(open(abs_path, "rb"), content_type=ctype)
+    resp["ETag"] = etag
+    resp["Last-Modified"] = http_date(st.st_mtime)
+    # Not immutable: this URL is per question, and editing the stem changes its image.
+    # Private: both image routes sit behind login
+    resp["Cache-Control"] = "private, no-cache"
+    return resp
 
 @login_required
 def student_stats_page(request):
@@ -775,38 +819,33 @@ def student_stats_page(request):
 def student_stats_api(request):
     user = request.user
 
-    # All attempts by this student
-    attempt_ids = list(
-        Attempt.objects.filter(student=user).values_list("id", flat=True)
-    )
-
-    # Distinct questions the student VIEWED (denominator),
-    # and total ms per (attempt, question)
-    # NOTE: multiple logs merge into one total per question
-    viewed_pairs_qs = (
-        AttemptView.objects.filter(attempt_id__in=attempt_ids)
+    # One row per viewed (attempt, question): summed view time, and whether that
+    # pair was answered correctly at least once. Everything below is aggregated in
+    # a single query over that grouping.
+    viewed_pairs = (
+        AttemptView.objects.filter(attempt__student=user)
         .values("attempt_id", "question_id")
-        .annotate(total_ms=Sum("view_ms"))
+        .annotate(
+            total_ms=Sum("view_ms"),
+            correct=Exists(AttemptItem.objects.filter(
+                attempt_id=OuterRef("attempt_id"),
+                question_id=OuterRef("question_id"),
+                is_correct=True,
+            )),
+        )
     )
-    viewed_pairs = [(r["attempt_id"], r["question_id"]) for r in viewed_pairs_qs]
-    viewed_count = len(viewed_pairs)
-
-    # Distinct (attempt, question) that were answered correctly at least once
-    correct_pairs = set(
-        AttemptItem.objects.filter(attempt_id__in=attempt_ids, is_correct=True)
-        .values_list("attempt_id", "question_id")
-        .distinct()
+    totals = viewed_pairs.aggregate(
+        viewed=Count("question_id"),
+        correct_viewed=Count("question_id", filter=Q(correct=True)),
+        avg_ms=Avg("total_ms"),
     )
-
-    # Numerator: of the viewed questions, how many ended up correct?
-    correct_viewed_count = sum(1 for pair in viewed_pairs if pair in correct_pairs)
+    viewed_count = totals["viewed"]
+    correct_viewed_count = totals["correct_viewed"]
 
     accuracy = (correct_viewed_count / viewed_count) if viewed_count else 0.0
 
     # Average view time per question (sum logs per question, then average)
-    avg_view_ms = 0
-    if viewed_pairs_qs.exists():
-        avg_view_ms = viewed_pairs_qs.aggregate(avg=Avg("total_ms"))["avg"] or 0
+    avg_view_ms = totals["avg_ms"] or 0
 
     data = {
         "viewed_count": viewed_count,
@@ -822,27 +861,32 @@ def student_stats_api(request):
 @csrf_exempt                 # allow sendBeacon() without CSRF header
 @login_required
 def attempt_view_log(request, attempt_id):
-    """POST {question_id, view_ms} → create AttemptView row for this user/attempt."""
+    """
+    POST {question_id, view_ms} → queue an AttemptView row for this user/attempt.
+    Ids are checked before the 200, but the row itself is written by VIEW_BUFFER
+    within about a second: a worker killed outright (SIGKILL, OOM) loses what it
+    had queued. Acceptable for view-time analytics; don't reuse this for data
+    that must survive a crash.
+    """
     if request.method != "POST":
         return JsonResponse({"ok": False, "error": "POST only"}, status=405)
 
     try:
         payload = json.loads(request.body.decode("utf-8") or "{}")
         qid = int(payload.get("question_id"))
-        ms  = max(0, int(payload.get("view_ms", 0)))
+        ms  = clamp_view_ms(payload.get("view_ms", 0))
     except Exception:
         return HttpResponseBadRequest("bad json")
 
     # Verify the attempt belongs to the current user
-    try:
-        attempt = Attempt.objects.get(id=attempt_id, student=request.user)
-    except Attempt.DoesNotExist:
+    if not Attempt.objects.filter(id=attempt_id, student=request.user).exists():
         return JsonResponse({"ok": False, "error": "attempt not found"}, status=404)
-
-    AttemptView.objects.create(
-        attempt=attempt,
-        question_id=qid,
-        view_ms=ms,
-        created_at=timezone.now(),
-    )
-    return JsonResponse({"ok": True, "saved": True})
+    # Checked here, not left to the FK at flush time: by then the client already has
+    # its 200 and the row would be dropped silently
+    if not Question.objects.filter(id=qid).exists():
+        return JsonResponse({"ok": False, "error": "question not found"}, status=404)
+
+    # Stamp the view time now; auto_now_add would only stamp it at flush time
+    VIEW_BUFFER.add(AttemptView(attempt_id=attempt_id, question_id=qid, view_ms=ms,
+                                created_at=timezone.now()))
+    return JsonResponse({"ok": True, "queued": True})
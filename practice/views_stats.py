@@ -1,85 +1,60 @@
 # lms/practice/views_stats.py
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Sum, Max
-from .models import AttemptView, AttemptItem, Question, Tag
+from django.db.models import OuterRef, Subquery, Sum
+from .models import AttemptView, AttemptItem, Tag
 
 @login_required
 def stats_me(request):
     user = request.user
 
-    # Per-question totals (ms)
-    q_views = (
+    # One row per viewed question, in a single query: summed view time, whether the
+    # latest answer to it was correct, and the child tag it is grouped under (lowest
+    # id, deterministic). AttemptItem.student always equals attempt.student, and
+    # filtering on it lets the latest-answer lookup use ai_student_q_latest.
+    latest_item = (
+        AttemptItem.objects
+        .filter(student=user, question_id=OuterRef('question_id'))
+        .order_by('-created_at', '-id')
+    )
+    child_tag = (
+        Tag.objects
+        .filter(questions=OuterRef('question_id'), parent__isnull=False)
+        .order_by('id')
+    )
+    rows = (
         AttemptView.objects
         .filter(attempt__student=user)
         .values('question_id')
-        .annotate(total_ms=Sum('view_ms'))
-    )
-    per_q_ms = {row['question_id']: (row['total_ms'] or 0) for row in q_views}
-    viewed_qids = list(per_q_ms.keys())
-
-    # Latest correctness per question
-    latest_rows = (
-        AttemptItem.objects
-        .filter(attempt__student=user, question_id__in=viewed_qids)
-        .values('question_id')
-        .annotate(latest_at=Max('created_at'))
-    )
-    latest_map = {}
-    if latest_rows:
-        latest_pairs = {(r['question_id'], r['latest_at']) for r in latest_rows}
-        fetched = (
-            AttemptItem.objects
-            .filter(attempt__student=user, question_id__in=[qid for qid, _ in latest_pairs])
-            .order_by('question_id', '-created_at')
+        .annotate(
+            total_ms=Sum('view_ms'),
+            latest_correct=Subquery(latest_item.values('is_correct')[:1]),
+            tag_id=Subquery(child_tag.values('id')[:1]),
+            tag_name=Subquery(child_tag.values('name')[:1]),
         )
-        seen = set()
-        for it in fetched:
-            if it.question_id in seen:
-                continue
-            if (it.question_id, it.created_at) in latest_pairs:
-                latest_map[it.question_id] = it
-                seen.add(it.question_id)
+    )
 
     # ---- Grouping (cover 100% of viewed questions) -------------------------
     groups: dict[int, dict] = {}
 
-    def _touch(tag: Tag):
-        d = groups.get(tag.id)
+    def _touch(tag_id: int, label: str):
+        d = groups.get(tag_id)
         if not d:
-            groups[tag.id] = d = {'label': tag.name, 'viewed': 0, 'correct': 0, 'total_ms': 0}
+            groups[tag_id] = d = {'label': label, 'viewed': 0, 'correct': 0, 'total_ms': 0}
         return d
 
     OTHER_KEY = -1
-    def _touch_other():
-        d = groups.get(OTHER_KEY)
-        if not d:
-            groups[OTHER_KEY] = d = {'label': 'Other', 'viewed': 0, 'correct': 0, 'total_ms': 0}
-        return d
-
-    q_tags = (
-        Question.objects
-        .filter(id__in=viewed_qids)
-        .prefetch_related('tags')
-        .only('id')
-    )
-
-    for q in q_tags:
-        it = latest_map.get(q.id)
-        was_correct = bool(getattr(it, 'is_correct', False))
-        ms = per_q_ms.get(q.id, 0)
 
-        # choose exactly ONE child tag if present; otherwise bucket into Other
-        child_tags = [t for t in q.tags.all() if t.parent_id]
-        if child_tags:
-            chosen = min(child_tags, key=lambda t: t.id)  # deterministic
-            d = _touch(chosen)
+    for row in rows:
+        # exactly ONE child tag if present; otherwise bucket into Other
+        if row['tag_id'] is not None:
+            d = _touch(row['tag_id'], row['tag_name'])
         else:
-            d = _touch_other()
+            d = _touch(OTHER_KEY, 'Other')
 
         d['viewed'] += 1
-        d['total_ms'] += ms
-        if was_correct:
+        d['total_ms'] += row['total_ms'] or 0
+        if row['latest_correct']:
             d['correct'] += 1
 
     # Compose breakdown and compute overall from the SAME pool
@@ -10,6 +10,8 @@ from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from .utils.latex_assets import cached_pdf
+
 # --- Locate tectonic ---------------------------------------------------------
 TECTONIC_BIN = getattr(settings, "TECTONIC_BIN", None) or os.path.join(
     settings.BASE_DIR, "bin", "tectonic"
@@ -39,7 +41,9 @@ def compile_tex_bytes(tex: str) -> bytes:
     Compile a LaTeX string to PDF bytes using tectonic.
     - If it's a full document (contains \documentclass), compile AS-IS.
     - If it's a snippet, wrap it with a minimal standalone preamble.
-    Raises RuntimeError with a readable log on failure.
+    The practice page asks for the same question figures over and over, so PDFs
+    come from the LATEX_CACHE_DIR cache when this exact source compiled before.
+    Raises RuntimeError with a readable log on failure (failures are not cached).
     """
     if not tex or not tex.strip():
         raise RuntimeError("missing tex")
@@ -53,6 +57,10 @@ def compile_tex_bytes(tex: str) -> bytes:
     else:
         full_tex = STANDALONE_WRAPPER % tex  # snippet → standalone
 
+    return cached_pdf(full_tex, _tectonic_pdf_bytes)
+
+
+def _tectonic_pdf_bytes(full_tex: str) -> bytes:
     with tempfile.TemporaryDirectory() as tmp:
         tex_path = os.path.join(tmp, "doc.tex")
         pdf_path = os.path.join(tmp, "doc.pdf")
@@ -78,7 +86,6 @@ def compile_tex_bytes(tex: str) -> bytes:
             return f.read()
 
 
-
 # ---------------------------------------------------------------------------
 # Existing endpoint: POST/GET TeX -> PDF (used by practice page)
 # ---------------------------------------------------------------------------